@@ -81,6 +81,12 @@ if [ $command = "celery" ]; then
     celery -A base worker -l info --max-tasks-per-child=1 --concurrency=1
 fi
 
+if [ $command = "celery-bg-removal" ]; then
+    # Solo pool, the inference engine keeps its own long-lived process pool
+    log "start background removal worker"
+    celery -A base worker -l info -Q bg_removal -P solo -n bg_removal@%h
+fi
+
 
 if [ $command = "celery-beat" ]; then
     log "start celery beat"
@@ -1,5 +1,12 @@
+import hashlib
+from functools import wraps
+
+from django.http import HttpResponseNotModified
+from django.utils.http import parse_etags, quote_etag
 from rest_framework.response import Response
-from rest_framework.status import HTTP_403_FORBIDDEN
+from rest_framework.status import HTTP_200_OK, HTTP_403_FORBIDDEN
+
+from app.utils.cache import get_versions
 
 
 def stripe_required(func):
@@ -16,3 +23,37 @@ def stripe_required(func):
             }, status=HTTP_403_FORBIDDEN)
 
     return wrapper
+
+
+def conditional_etag(get_resources):
+    """
+    Adds a strong ETag to the view method's response and answers
+    `If-None-Match` with 304 without running the view.
+    `get_resources(view, request, *args, **kwargs)` names the versioned
+    resources (see app.utils.cache) the response is built from.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(self, request, *args, **kwargs):
+            versions = get_versions(
+                get_resources(self, request, *args, **kwargs))
+            etag = quote_etag(hashlib.sha1(repr((
+                sorted(versions.items()),
+                request.get_full_path(),
+                request.accepted_media_type,
+            )).encode('utf-8')).hexdigest())
+
+            if_none_match = parse_etags(
+                request.META.get('HTTP_IF_NONE_MATCH', ''))
+            # No `*`, on a read it would 304 before the view can 404/403
+            if etag in if_none_match:
+                response = HttpResponseNotModified()
+                response['ETag'] = etag
+                return response
+
+            response = func(self, request, *args, **kwargs)
+            if response.status_code == HTTP_200_OK:
+                response['ETag'] = etag
+            return response
+        return wrapper
+    return decorator
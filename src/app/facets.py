@@ -0,0 +1,98 @@
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+from django.db import transaction
+from django.db.models import CharField, Count, F, Value
+from django.db.models.functions import Cast
+
+from app.models.product import ProductFacetCount
+
+# Facet name -> Product attribute counted for it
+FACET_FIELDS = {
+    'gender': 'gender',
+    'quality': 'quality',
+    'category': 'category_id',
+    'brand': 'brand_id',
+    'size': 'size_id',
+}
+
+FacetRow = Tuple[str, str, int]
+
+
+def get_facet_values(values: Dict) -> List[Tuple[str, str]]:
+    """
+    (facet, value) pairs for a mapping of Product attnames to values,
+    e.g. an instance `__dict__` or `tracker.previous()` lookups.
+    """
+    return [
+        (facet, str(values[attname]))
+        for facet, attname in FACET_FIELDS.items()
+        if values.get(attname) not in (None, '')
+    ]
+
+
+def count_facets(queryset) -> List[FacetRow]:
+    """
+    Counts every facet value of `queryset` with a single UNION ALL query.
+    """
+    queryset = queryset.order_by()
+    parts = [
+        queryset.exclude(**{f'{attname}__isnull': True}).annotate(
+            facet=Value(facet, output_field=CharField()),
+            value=Cast(attname, output_field=CharField()),
+        ).values('facet', 'value').annotate(count=Count('pk'))
+        for facet, attname in FACET_FIELDS.items()
+    ]
+    rows = parts[0].union(*parts[1:], all=True)
+    return [(row['facet'], row['value'], row['count']) for row in rows]
+
+
+def group_facets(rows: Iterable[FacetRow]) -> Dict[str, Dict[str, int]]:
+    facets = {facet: {} for facet in FACET_FIELDS}
+    for facet, value, count in rows:
+        if count > 0:
+            facets[facet][value] = count
+    return facets
+
+
+def adjust_facet_counts(deltas: Counter):
+    """
+    Applies `{(facet, value): delta}` to the materialized counts.
+    """
+    with transaction.atomic():
+        for (facet, value), delta in deltas.items():
+            rows = ProductFacetCount.objects.filter(facet=facet, value=value)
+            if rows.update(count=F('count') + delta) or delta < 0:
+                continue
+            _, created = ProductFacetCount.objects.get_or_create(
+                facet=facet, value=value, defaults={'count': delta})
+            if not created:
+                rows.update(count=F('count') + delta)
+
+
+def get_materialized_facets() -> Dict[str, Dict[str, int]]:
+    return group_facets(
+        ProductFacetCount.objects.values_list('facet', 'value', 'count'))
+
+
+def rebuild_facet_counts(queryset, facet_count_model) -> int:
+    """
+    Replaces the materialized counts with a fresh aggregation of `queryset`.
+    """
+    rows = count_facets(queryset)
+    with transaction.atomic():
+        facet_count_model.objects.all().delete()
+        facet_count_model.objects.bulk_create([
+            facet_count_model(facet=facet, value=value, count=count)
+            for facet, value, count in rows
+        ])
+    return len(rows)
+
+
+def get_facet_deltas(previous: Dict, current: Dict) -> Counter:
+    deltas = defaultdict(int)
+    for key in get_facet_values(previous):
+        deltas[key] -= 1
+    for key in get_facet_values(current):
+        deltas[key] += 1
+    return Counter({key: delta for key, delta in deltas.items() if delta})
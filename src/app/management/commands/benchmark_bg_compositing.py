@@ -0,0 +1,87 @@
+import io
+import time
+
+import numpy as np
+import png
+from django.core.management import BaseCommand
+from PIL import Image
+
+from app.utils.bg_removal.compositor import compose_rgba, encode_rgba
+
+
+def legacy_compose(img_original: np.ndarray, mask_image: Image.Image) -> bytes:
+    """ The post-processing of the former BackgroundRemovalUtil.run """
+    converted = np.array(mask_image)
+    thresh1 = (converted > 127).astype(np.uint8)
+    thresh2 = np.where(converted > 127, 0, 255).astype(np.uint8)
+
+    result = img_original * thresh1 + thresh2
+    result = result.tolist()
+
+    rows, cols = thresh1.shape[:2]
+    for i in range(rows):
+        for j in range(cols):
+            if thresh1[i][j][0] == 0:
+                result[i][j].append(0)
+            else:
+                result[i][j].append(255)
+
+    result = np.reshape(result, (rows, cols * 4))
+    rlt = result.astype('uint8')
+    buffer = io.BytesIO()
+    png.from_array(rlt, mode='RGBA').write(buffer)
+    return buffer.getvalue()
+
+
+class Command(BaseCommand):
+    help = (
+        'Times composing and encoding a background removal result with '
+        'the former per pixel loop and with the array compositor.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--width', type=int, default=1200)
+        parser.add_argument('--height', type=int, default=1600)
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument(
+            '--skip-legacy', action='store_true',
+            help='The loop takes minutes on full size photos')
+
+    def handle(self, *args, **options):
+        size = (options['width'], options['height'])
+        rng = np.random.default_rng(0)
+        photo = rng.integers(
+            0, 256, (size[1], size[0], 3), dtype=np.uint8)
+        image = Image.fromarray(photo, 'RGB')
+        # A blob in the middle with soft edges, like a U2NET output
+        y, x = np.mgrid[0:320, 0:320]
+        distance = np.hypot(x - 160, y - 160) / 160
+        mask = np.clip(1.5 - distance * 1.5, 0, 1).astype(np.float32)
+
+        self.stdout.write(f'{size[0]}x{size[1]} photo, best of {options["repeat"]}')
+        if not options['skip_legacy']:
+            mask_image = Image.fromarray(
+                (mask * 255).astype(np.uint8)).convert('RGB').resize(
+                    size, resample=Image.BILINEAR)
+            self.time(
+                'legacy loop',
+                lambda: legacy_compose(photo, mask_image), options['repeat'])
+        for label, soft, image_format in (
+                ('hard PNG', False, 'PNG'),
+                ('soft PNG', True, 'PNG'),
+                ('soft WEBP', True, 'WEBP')):
+            self.time(
+                label,
+                lambda: encode_rgba(
+                    compose_rgba(image, mask, soft=soft), image_format).size,
+                options['repeat'])
+
+    def time(self, label, run, repeat):
+        best, output = None, None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            output = run()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        size = output if isinstance(output, int) else len(output)
+        self.stdout.write(
+            f'  {label:<12} {best * 1000:10.1f} ms {size / 1024:10.1f} KiB')
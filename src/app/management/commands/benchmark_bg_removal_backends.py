@@ -0,0 +1,88 @@
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from django.core.management import BaseCommand
+from PIL import Image
+
+from app.utils.bg_removal.base import BG_REMOVAL_BACKEND
+from app.utils.bg_removal.engine import normalize_prediction, preprocess
+
+VARIANTS = (
+    ('torch fp32', BG_REMOVAL_BACKEND.torch, False),
+    ('torchscript', BG_REMOVAL_BACKEND.torchscript, False),
+    ('onnx fp32', BG_REMOVAL_BACKEND.onnx, False),
+    ('onnx int8', BG_REMOVAL_BACKEND.onnx, True),
+)
+
+
+def _peak_rss() -> int:
+    # Kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def run_variant(model_name, backend, quantized, threads, inputs, repeat):
+    """ Runs in a fresh process, so the RSS is the variant's alone """
+    from app.utils.bg_removal.base import load_predictor
+
+    rss_before = _peak_rss()
+    started = time.perf_counter()
+    predictor = load_predictor(model_name, backend, quantized, threads)
+    load_seconds = time.perf_counter() - started
+
+    latency, masks = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        masks = normalize_prediction(predictor(inputs))
+        elapsed = time.perf_counter() - started
+        latency = elapsed if latency is None else min(latency, elapsed)
+    return load_seconds, latency, _peak_rss(), rss_before, masks
+
+
+def mask_iou(masks: np.ndarray, reference: np.ndarray) -> float:
+    predicted, expected = masks > 0.5, reference > 0.5
+    union = np.logical_or(predicted, expected).sum()
+    if not union:
+        return 1.0
+    return float(np.logical_and(predicted, expected).sum() / union)
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares the inference backends of a background removal model: '
+        'load time, batch latency, peak RSS and mask IoU against torch fp32.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+')
+        parser.add_argument('--model', default='u2net')
+        parser.add_argument('--threads', type=int, default=2)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        images = [Image.open(path) for path in options['paths']]
+        inputs = np.stack([preprocess(image) for image in images])
+        self.stdout.write(
+            f'{options["model"]}, batch of {len(images)}, '
+            f'{options["threads"]} threads')
+
+        reference = None
+        for label, backend, quantized in VARIANTS:
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                try:
+                    load, latency, rss, rss_before, masks = executor.submit(
+                        run_variant, options['model'], backend, quantized,
+                        options['threads'], inputs, options['repeat']
+                    ).result()
+                except Exception as e:
+                    self.stderr.write(f'  {label:<12} skipped: {e}')
+                    continue
+            if reference is None:
+                reference = masks
+            self.stdout.write(
+                f'  {label:<12} load {load:6.2f} s '
+                f'batch {latency * 1000:8.1f} ms '
+                f'({latency * 1000 / len(images):7.1f} ms/image) '
+                f'RSS {rss / 2 ** 20:7.1f} MiB '
+                f'(+{(rss - rss_before) / 2 ** 20:.1f}) '
+                f'IoU {mask_iou(masks, reference):.4f}')
@@ -0,0 +1,89 @@
+import multiprocessing
+import time
+
+import numpy as np
+from django.core.management import BaseCommand
+
+MODES = ('checkpoint', 'mmap')
+
+
+def read_memory() -> dict:
+    """ Rss, Pss, Shared_Clean and Private_Dirty of this process, in bytes """
+    memory = {}
+    with open('/proc/self/smaps_rollup') as smaps:
+        for line in smaps:
+            key, _, value = line.partition(':')
+            if key in ('Rss', 'Pss', 'Shared_Clean', 'Private_Dirty'):
+                memory[key] = int(value.split()[0]) * 1024
+    return memory
+
+
+def run_child(mode, model_name, barrier, results):
+    started = time.perf_counter()
+    import torch
+
+    from app.utils.bg_removal import base
+    imported = time.perf_counter() - started
+
+    started = time.perf_counter()
+    if mode == 'mmap':
+        predictor = base.registry.get_predictor(model_name)
+    else:
+        net = base.load_checkpoint(model_name)
+
+        def predictor(batch):
+            with torch.inference_mode():
+                return net(torch.from_numpy(batch))[0]
+    loaded = time.perf_counter() - started
+
+    # Touches every weight page
+    predictor(np.zeros((1, 3, 320, 320), dtype=np.float32))
+    # Measured while all children are alive, so PSS splits shared pages
+    barrier.wait()
+    results.put((imported, loaded, read_memory()))
+    barrier.wait()
+
+
+class Command(BaseCommand):
+    help = (
+        'Starts forked children loading a background removal model, from '
+        'the .pth checkpoint or the memory-mapped safetensors, and reports '
+        'their startup time and memory.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', default='u2net')
+        parser.add_argument('--children', type=int, default=4)
+        parser.add_argument('--mode', choices=MODES, nargs='+', default=MODES)
+
+    def handle(self, *args, **options):
+        context = multiprocessing.get_context('fork')
+        children = options['children']
+        self.stdout.write(f'{options["model"]}, {children} forked children')
+        for mode in options['mode']:
+            barrier = context.Barrier(children)
+            results = context.Queue()
+            processes = [
+                context.Process(
+                    target=run_child,
+                    args=(mode, options['model'], barrier, results))
+                for _ in range(children)
+            ]
+            for process in processes:
+                process.start()
+            stats = [results.get() for _ in processes]
+            for process in processes:
+                process.join()
+
+            imported = max(stat[0] for stat in stats)
+            loaded = max(stat[1] for stat in stats)
+            memory = {
+                key: sum(stat[2][key] for stat in stats) / 2 ** 20
+                for key in stats[0][2]
+            }
+            self.stdout.write(
+                f'  {mode:<10} import {imported:5.2f} s '
+                f'load {loaded:5.2f} s | total of children: '
+                f'RSS {memory["Rss"]:8.1f} MiB '
+                f'PSS {memory["Pss"]:8.1f} MiB '
+                f'shared clean {memory["Shared_Clean"]:8.1f} MiB '
+                f'private dirty {memory["Private_Dirty"]:8.1f} MiB')
@@ -0,0 +1,86 @@
+import os
+import tempfile
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from PIL import Image
+
+from app.utils.images import normalize_image
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares the previous ingest (full decode, fixed-size resize, '
+        'temp file read back into memory) with the single pass '
+        'normalization, for every image given.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+')
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        runs = (('legacy', self.legacy), ('single pass', self.single_pass))
+        totals = {label: [0, 0, 0] for label, _ in runs}
+        for path in options['paths']:
+            self.stdout.write(path)
+            for label, run in runs:
+                result = (
+                    *self.measure(run, path, options['repeat']),
+                    self.decoded_bytes(path, draft=run == self.single_pass))
+                for i, value in enumerate(result):
+                    totals[label][i] += value
+                self.report(label, *result)
+
+        count = len(options['paths'])
+        self.stdout.write(f'Average per image ({count})')
+        for label, result in totals.items():
+            self.report(label, *(value / count for value in result))
+
+    def report(self, label, seconds, python_peak, decoded):
+        self.stdout.write(
+            f'  {label:<12} {seconds * 1000:8.1f} ms '
+            f'{python_peak / 2 ** 20:8.2f} MiB python peak '
+            f'{decoded / 2 ** 20:8.2f} MiB decoded')
+
+    def measure(self, run, path, repeat):
+        best, python_peak = None, 0
+        for _ in range(repeat):
+            tracemalloc.start()
+            started = time.perf_counter()
+            with open(path, 'rb') as file_:
+                run(file_)
+            elapsed = time.perf_counter() - started
+            python_peak = max(python_peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            best = elapsed if best is None else min(best, elapsed)
+        return best, python_peak
+
+    def decoded_bytes(self, path, draft):
+        # Pillow allocates pixel buffers outside of tracemalloc's view,
+        # the size of the decoded image is reported instead
+        with Image.open(path) as image:
+            if draft and image.format == 'JPEG':
+                max_edge = settings.LISTING_ITEM_IMAGE_MAX_EDGE
+                image.draft(image.mode, (max_edge, max_edge))
+            return image.size[0] * image.size[1] * len(image.getbands())
+
+    def legacy(self, file_):
+        image = Image.open(file_)
+        resized = image.resize((
+            settings.LISTING_ITEM_IMAGE_RESIZE_DEFAULT_WIDTH,
+            settings.LISTING_ITEM_IMAGE_RESIZE_DEFAULT_HEIGHT))
+        with tempfile.NamedTemporaryFile(suffix=f'.{image.format}') as source:
+            resized.save(source, format=image.format)
+            # Product.save read the resized copy back in full
+            source.seek(0)
+            source.read()
+        # and the original was stored as uploaded
+        file_.seek(0)
+        file_.read()
+
+    def single_pass(self, file_):
+        normalized = normalize_image(file_, bg_removal_source=True)
+        normalized.file.read()
+        os.remove(normalized.bg_removal_source)
@@ -0,0 +1,102 @@
+import random
+import statistics
+import time
+
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q
+
+from app.models.product import (
+    Product, ProductBrand, ProductCategory, ProductSize)
+from app.utils.relevance import (
+    annotate_relevance, get_match_tokens, get_match_vector)
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares feed relevance queries: the legacy COUNT(Q) annotation '
+        'against the precomputed match vectors. Seeded data is rolled back.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100000)
+        parser.add_argument('--runs', type=int, default=200)
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        with transaction.atomic():
+            choices = self.seed(options['products'])
+            requests = [
+                self.random_params(choices) for _ in range(options['runs'])]
+
+            for label, query in (
+                    ('count(q)', self.legacy_query),
+                    ('match_vector', self.vector_query)):
+                timings = []
+                for params in requests:
+                    started = time.perf_counter()
+                    list(query(params)[:options['page_size']])
+                    timings.append((time.perf_counter() - started) * 1000)
+                self.report(label, timings)
+            transaction.set_rollback(True)
+
+    def seed(self, count):
+        choices = {
+            'category': list(
+                ProductCategory.objects.values_list('pk', flat=True)),
+            'brand': list(ProductBrand.objects.values_list('pk', flat=True)),
+            'size': list(ProductSize.objects.values_list('pk', flat=True)),
+            'gender': [value for value, _ in Product.GENDER_CHOICES],
+        }
+        for attr, model in (
+                ('category', ProductCategory),
+                ('brand', ProductBrand),
+                ('size', ProductSize)):
+            if not choices[attr]:
+                choices[attr] = [
+                    model.objects.create(name=f'benchmark {attr} {i}').pk
+                    for i in range(20)
+                ]
+
+        self.stdout.write(f'Seeding {count} products...')
+        batch = []
+        for i in range(count):
+            product = Product(
+                title=f'benchmark product {i}',
+                category_id=random.choice(choices['category']),
+                brand_id=random.choice(choices['brand']),
+                size_id=random.choice(choices['size']),
+                gender=random.choice(choices['gender']),
+            )
+            product.match_vector = get_match_vector(product)
+            batch.append(product)
+            if len(batch) == 5000:
+                Product.objects.bulk_create(batch)
+                batch = []
+        Product.objects.bulk_create(batch)
+        return choices
+
+    def random_params(self, choices):
+        return {
+            attr: random.sample(values, min(len(values), random.randint(1, 3)))
+            for attr, values in choices.items()
+            if random.random() < 0.7
+        } or {'category': [random.choice(choices['category'])]}
+
+    def legacy_query(self, params):
+        query = Q(**{f'{attr}__in': values for attr, values in params.items()})
+        return Product.objects.annotate(
+            matched_items=Count(query)
+        ).filter(query).order_by('-matched_items', '-created', 'pk')
+
+    def vector_query(self, params):
+        return annotate_relevance(
+            Product.objects.all(), get_match_tokens(params)
+        ).order_by('-matched_items', '-created', 'pk')
+
+    def report(self, label, timings):
+        percentiles = statistics.quantiles(timings, n=100)
+        self.stdout.write(
+            f'{label:<14} p50={percentiles[49]:.2f}ms '
+            f'p99={percentiles[98]:.2f}ms runs={len(timings)}')
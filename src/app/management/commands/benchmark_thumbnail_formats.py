@@ -0,0 +1,71 @@
+import math
+from collections import defaultdict
+
+from django.core.management import BaseCommand
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.parsers import parse_geometry
+
+from app.models.product import Product
+from app.utils.thumbnails import (
+    collect_related, get_thumbnail_options, get_variant_formats)
+
+
+class Command(BaseCommand):
+    help = (
+        'Encodes the thumbnails of the latest feed pages in the original '
+        'and every variant format and reports the bytes per page.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=5)
+        parser.add_argument('--page-size', type=int, default=20)
+
+    def handle(self, *args, **options):
+        products = list(Product.objects.get_all_published().order_by(
+            '-created').prefetch_related('images')[
+                :options['pages'] * options['page_size']])
+        formats = [None] + get_variant_formats()
+        totals = defaultdict(int)
+        thumbnails = 0
+
+        for instance in collect_related(products, ('images',)):
+            for file_, geometry in instance.get_thumbnail_sources().values():
+                if not file_:
+                    continue
+                for image_format, size in self.encode(file_, geometry, formats):
+                    totals[image_format] += size
+                thumbnails += 1
+
+        pages = max(math.ceil(len(products) / options['page_size']), 1)
+        original = totals[None] or 1
+        self.stdout.write(f'{thumbnails} thumbnails over {pages} pages')
+        for image_format in formats:
+            label = image_format or 'original'
+            per_page = totals[image_format] / pages
+            self.stdout.write(
+                f'{label:<9} {per_page / 1024:10.1f} KiB/page '
+                f'{totals[image_format] / original:7.1%} of original')
+
+    def encode(self, file_, geometry, formats):
+        backend, engine = default.backend, default.engine
+        source = ImageFile(file_)
+        try:
+            source_image = engine.get_image(source)
+        except Exception as e:
+            self.stderr.write(f'Skipping {source.name}: {e}')
+            return
+        try:
+            image_info = engine.get_image_info(source_image)
+            for image_format in formats:
+                thumbnail_options = backend.get_thumbnail_options(
+                    source, get_thumbnail_options(image_format))
+                ratio = engine.get_image_ratio(source_image, thumbnail_options)
+                image = engine.create(
+                    source_image, parse_geometry(geometry, ratio),
+                    thumbnail_options)
+                raw_data = engine._get_raw_data(
+                    image, thumbnail_options['format'],
+                    thumbnail_options['quality'], image_info=image_info)
+                yield image_format, len(raw_data or b'')
+        finally:
+            engine.cleanup(source_image)
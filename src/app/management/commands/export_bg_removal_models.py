@@ -0,0 +1,94 @@
+import os
+
+import boto3
+import torch
+from django.conf import settings
+from django.core.management import BaseCommand
+
+from app.utils.bg_removal.base import (
+    BG_REMOVAL_BACKEND, BG_REMOVAL_MODEL_OPTION, ONNX_INPUT_NAME,
+    get_model_file_name, load_checkpoint)
+from app.utils.bg_removal.engine import MODEL_INPUT_SIZE
+
+OUTPUT_NAMES = [f'd{i}' for i in range(7)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Exports the U2NET .pth checkpoints to safetensors, TorchScript, '
+        'ONNX and int8 quantized ONNX, optionally uploading them.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--models', nargs='+',
+            default=[
+                BG_REMOVAL_MODEL_OPTION.u2net, BG_REMOVAL_MODEL_OPTION.u2netp])
+        parser.add_argument('--opset', type=int, default=17)
+        parser.add_argument(
+            '--upload', action='store_true',
+            help='Upload the exports to the models/ prefix of the bucket')
+
+    def handle(self, *args, **options):
+        for model_name in options['models']:
+            net = load_checkpoint(model_name)
+            example = torch.rand(1, 3, MODEL_INPUT_SIZE, MODEL_INPUT_SIZE)
+            exported = [
+                self.export_safetensors(model_name, net),
+                self.export_torchscript(model_name, net, example),
+                self.export_onnx(model_name, net, example, options['opset']),
+            ]
+            exported.append(self.quantize(model_name))
+            for file_name in exported:
+                size = os.path.getsize(file_name) / 2 ** 20
+                self.stdout.write(f'{file_name} ({size:.1f} MB)')
+                if options['upload']:
+                    self.upload(file_name)
+
+    def export_safetensors(self, model_name, net) -> str:
+        from safetensors.torch import save_file
+
+        # Memory-mapped by the torch backend, see bg_removal.base
+        file_name = get_model_file_name(model_name, BG_REMOVAL_BACKEND.torch)
+        save_file(
+            {name: tensor.contiguous()
+             for name, tensor in net.state_dict().items()},
+            file_name)
+        return file_name
+
+    def export_torchscript(self, model_name, net, example) -> str:
+        file_name = get_model_file_name(
+            model_name, BG_REMOVAL_BACKEND.torchscript)
+        with torch.no_grad():
+            traced = torch.jit.freeze(torch.jit.trace(net, example))
+        traced.save(file_name)
+        return file_name
+
+    def export_onnx(self, model_name, net, example, opset) -> str:
+        file_name = get_model_file_name(model_name, BG_REMOVAL_BACKEND.onnx)
+        dynamic_axes = {ONNX_INPUT_NAME: {0: 'batch'}}
+        dynamic_axes.update({name: {0: 'batch'} for name in OUTPUT_NAMES})
+        torch.onnx.export(
+            net, example, file_name, opset_version=opset,
+            input_names=[ONNX_INPUT_NAME], output_names=OUTPUT_NAMES,
+            dynamic_axes=dynamic_axes)
+        return file_name
+
+    def quantize(self, model_name) -> str:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        # Dynamic quantization: int8 weights, activations quantized at
+        # run time, no calibration set needed
+        file_name = get_model_file_name(
+            model_name, BG_REMOVAL_BACKEND.onnx, quantized=True)
+        quantize_dynamic(
+            get_model_file_name(model_name, BG_REMOVAL_BACKEND.onnx),
+            file_name, weight_type=QuantType.QUInt8)
+        return file_name
+
+    def upload(self, file_name):
+        s3 = boto3.resource(
+            's3',
+            aws_access_key_id=settings.AWS_S3_ACCESS_KEY_ID,
+            aws_secret_access_key=settings.AWS_S3_SECRET_ACCESS_KEY)
+        s3.Bucket(settings.AWS_STORAGE_BUCKET_NAME).upload_file(
+            file_name, f'models/{os.path.basename(file_name)}')
@@ -0,0 +1,13 @@
+from django.core.management import BaseCommand
+
+from app.facets import rebuild_facet_counts
+from app.models.product import Product, ProductFacetCount
+
+
+class Command(BaseCommand):
+    help = 'Recounts the materialized product facet counts.'
+
+    def handle(self, *args, **options):
+        rows = rebuild_facet_counts(
+            Product.objects.get_all_published(), ProductFacetCount)
+        self.stdout.write(self.style.SUCCESS(f'{rows} facet values counted'))
@@ -0,0 +1,22 @@
+from django.core.management import BaseCommand
+
+from app.models.product import Product
+from app.search import update_search_vectors
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds Product.search_vector for the whole catalog.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        pks = list(
+            Product.objects.order_by('pk').values_list('pk', flat=True))
+        updated = 0
+        for start in range(0, len(pks), batch_size):
+            updated += update_search_vectors(
+                Product.objects.filter(pk__in=pks[start:start + batch_size]))
+            self.stdout.write(f'{updated}/{len(pks)} products indexed')
+        self.stdout.write(self.style.SUCCESS('Search index rebuilt'))
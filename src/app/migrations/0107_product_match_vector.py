@@ -0,0 +1,82 @@
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+BATCH_SIZE = 2000
+
+# Frozen copy of app.utils.relevance as of this migration
+MATCH_DIMENSIONS = ('category', 'size', 'brand', 'gender')
+GENDERS = ('girl', 'boy', 'neutral')
+
+
+def encode_match_token(dimension, value):
+    if value in (None, ''):
+        return None
+    if dimension == 'gender':
+        value = str(value).lower()
+        if value not in GENDERS:
+            return None
+        value = GENDERS.index(value)
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return None
+    return ((MATCH_DIMENSIONS.index(dimension) + 1) << 32) | value
+
+
+def get_match_vector(product):
+    tokens = [
+        encode_match_token('category', product.category_id),
+        encode_match_token('size', product.size_id),
+        encode_match_token('brand', product.brand_id),
+        encode_match_token('gender', product.gender),
+    ]
+    return [token for token in tokens if token is not None]
+
+
+def fill_match_vectors(apps, schema_editor):
+    Product = apps.get_model('app', 'Product')
+    queryset = Product.objects.only(
+        'pk', 'category_id', 'size_id', 'brand_id', 'gender').order_by('pk')
+
+    batch = []
+    for product in queryset.iterator(chunk_size=BATCH_SIZE):
+        product.match_vector = get_match_vector(product)
+        batch.append(product)
+        if len(batch) >= BATCH_SIZE:
+            Product.objects.bulk_update(batch, ['match_vector'])
+            batch = []
+    if batch:
+        Product.objects.bulk_update(batch, ['match_vector'])
+
+
+def do_nothing(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0106_product_favourite'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='match_vector',
+            field=django.contrib.postgres.fields.ArrayField(
+                base_field=models.BigIntegerField(), blank=True,
+                default=list, editable=False, size=None),
+        ),
+        migrations.RunPython(fill_match_vectors, do_nothing),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=['match_vector'], name='product_match_vector_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(
+                fields=['-created', 'id'], name='product_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,71 @@
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.operations import TrigramExtension
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+SEARCH_CONFIG = 'english'
+
+
+def fill_search_vectors(apps, schema_editor):
+    # Frozen copy of app.search.update_search_vectors as of this migration
+    Product = apps.get_model('app', 'Product')
+    Bundle = apps.get_model('app', 'Bundle')
+    tags = Bundle.objects.filter(
+        pk=OuterRef('bundle_id')
+    ).annotate(
+        names=StringAgg('tags__name', delimiter=' ')
+    ).values('names')
+    documents = Product.objects.filter(
+        pk=OuterRef('pk')
+    ).annotate(
+        document=(
+            SearchVector('title', weight='A', config=SEARCH_CONFIG)
+            + SearchVector('brand__name', weight='A', config=SEARCH_CONFIG)
+            + SearchVector('category__name', weight='B', config=SEARCH_CONFIG)
+            + SearchVector(Subquery(tags), weight='B', config=SEARCH_CONFIG)
+            + SearchVector('size__name', weight='C', config=SEARCH_CONFIG)
+        )
+    ).values('document')
+    Product.objects.update(search_vector=Subquery(documents))
+
+
+def do_nothing(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0107_product_match_vector'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(
+                blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(fill_search_vectors, do_nothing),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=['search_vector'], name='product_search_vector_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=['title'], name='product_title_trgm',
+                opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='productbrand',
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=['name'], name='productbrand_name_trgm',
+                opclasses=['gin_trgm_ops']),
+        ),
+    ]
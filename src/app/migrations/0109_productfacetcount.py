@@ -0,0 +1,62 @@
+from django.db import migrations, models
+from django.db.models import CharField, Count, Value
+from django.db.models.functions import Cast
+
+# Frozen copy of app.facets.FACET_FIELDS as of this migration
+FACET_FIELDS = {
+    'gender': 'gender',
+    'quality': 'quality',
+    'category': 'category_id',
+    'brand': 'brand_id',
+    'size': 'size_id',
+}
+
+
+def fill_facet_counts(apps, schema_editor):
+    Product = apps.get_model('app', 'Product')
+    ProductFacetCount = apps.get_model('app', 'ProductFacetCount')
+    queryset = Product.objects.order_by()
+    parts = [
+        queryset.exclude(**{f'{attname}__isnull': True}).annotate(
+            facet=Value(facet, output_field=CharField()),
+            value=Cast(attname, output_field=CharField()),
+        ).values('facet', 'value').annotate(count=Count('pk'))
+        for facet, attname in FACET_FIELDS.items()
+    ]
+    rows = parts[0].union(*parts[1:], all=True)
+    ProductFacetCount.objects.bulk_create([
+        ProductFacetCount(
+            facet=row['facet'], value=row['value'], count=row['count'])
+        for row in rows
+    ])
+
+
+def do_nothing(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0108_product_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductFacetCount',
+            fields=[
+                ('id', models.AutoField(
+                    auto_created=True, primary_key=True, serialize=False,
+                    verbose_name='ID')),
+                ('facet', models.CharField(max_length=32)),
+                ('value', models.CharField(max_length=255)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Product Facet Count',
+                'verbose_name_plural': 'Product Facet Counts',
+                'unique_together': {('facet', 'value')},
+            },
+        ),
+        migrations.RunPython(fill_facet_counts, do_nothing),
+    ]
@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import django_currentuser.db.models.fields
+import django_currentuser.middleware
+import django_fsm
+import model_utils.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('app', '0111_productimage_hashes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BackgroundRemovalJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', model_utils.fields.AutoCreatedField(default=django.utils.timezone.now, editable=False, verbose_name='created')),
+                ('modified', model_utils.fields.AutoLastModifiedField(default=django.utils.timezone.now, editable=False, verbose_name='modified')),
+                ('status', django_fsm.FSMField(choices=[('p', 'pending'), ('i', 'in progress'), ('d', 'done'), ('f', 'failed')], default='p', max_length=50)),
+                ('image_statuses', models.JSONField(default=dict)),
+                ('task_uuid', models.UUIDField(blank=True, null=True, verbose_name='background removal task id')),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('created_by', django_currentuser.db.models.fields.CurrentUserField(default=django_currentuser.middleware.get_current_authenticated_user, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='created_%(app_label)s_%(class)s_set', to=settings.AUTH_USER_MODEL)),
+                ('modified_by', django_currentuser.db.models.fields.CurrentUserField(default=django_currentuser.middleware.get_current_authenticated_user, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='modified_%(app_label)s_%(class)s_set', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Background Removal Job',
+                'verbose_name_plural': 'Background Removal Jobs',
+            },
+        ),
+    ]
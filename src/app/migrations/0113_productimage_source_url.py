@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0112_backgroundremovaljob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productimage',
+            name='source_url',
+            field=models.URLField(blank=True, editable=False, max_length=2048, null=True),
+        ),
+    ]
@@ -16,5 +16,5 @@ __all__ = (
     'ProductBrand', 'ProductSize', 'Shipment', 'ShipmentTracker',
     'PickUp', 'ShippingRate', 'ExpiringToken', 'ByndeAccount', 'ByndeCustomer',
     'CartItem', 'Cart', 'ProductImage', 'SuggestedProductBrand',
-    'Order', 'OrderItem',
+    'Order', 'OrderItem', 'ProductFacetCount', 'BackgroundRemovalJob',
 )
@@ -9,10 +9,13 @@ from decimal import Decimal
 from django.db import models, transaction
 from django.core.cache import cache
 from django.conf import settings
-from django.core.files.base import ContentFile
+from django.core.files import File
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.contrib.auth import get_user_model
 from django.db.models import JSONField
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.utils.text import slugify
 from django.utils.translation import gettext_lazy as _
 from django.utils.safestring import mark_safe
@@ -27,9 +30,7 @@ from celery.result import AsyncResult
 from celery.worker.control import revoke
 from taggit.managers import TaggableManager
 from djmoney.money import Money
-from sorl.thumbnail import (
-    get_thumbnail, ImageField as SorlImageField
-)
+from sorl.thumbnail import ImageField as SorlImageField
 
 from model_utils.fields import MonitorField
 from model_utils.models import TimeStampedModel
@@ -40,9 +41,13 @@ from mptt.models import MPTTModel, TreeForeignKey
 
 from app.constants.status import PRODUCT_STATUS, ORDER_ITEM_STATUS, BUNDLE_TYPES
 from app.tasks.orders import release_fund_manually
-#     remove_background_from_product_single_image
+from app.tasks.bg_removal import (
+    remove_background_from_product_single_image, run_background_removal_job)
 from app.models.base import AuthStampedModel
 from app.utils.analytics import track_analytics
+from app.utils.images import get_image_hashes
+from app.utils.relevance import get_match_vector
+from app.utils.thumbnails import ThumbnailMixin
 
 
 UserModelRef = get_user_model()
@@ -62,6 +67,9 @@ class ProductManager(models.manager.Manager):
     def get_all_published(self):
         return self.get_queryset()
 
+    def get_all_purchased(self, current_user):
+        return self.get_queryset().filter(bundle__purchased_by=current_user)
+
 
 class Bundle(TimeStampedModel, AuthStampedModel):
     _errors = defaultdict(list)
@@ -230,7 +238,7 @@ class BG_REMOVAL_STATUS:
     failed = 'f'
 
 
-class Product(TimeStampedModel, AuthStampedModel):
+class Product(ThumbnailMixin, TimeStampedModel, AuthStampedModel):
     GENDER_CHOICES = (
         ('girl', 'Girl'),
         ('boy', 'Boy'),
@@ -298,10 +306,37 @@ class Product(TimeStampedModel, AuthStampedModel):
     bg_removal_details = JSONField(default=None, null=True, blank=True)
     bg_removed_at = models.DateTimeField(
         null=True, blank=True)
+    thumbnails_generated_at = models.DateTimeField(
+        null=True, blank=True, editable=False)
+    # Relevance tokens, see app.utils.relevance
+    match_vector = ArrayField(
+        models.BigIntegerField(), default=list, blank=True, editable=False)
+    # Full-text document, maintained by app.search.update_search_vectors
+    search_vector = SearchVectorField(null=True, blank=True, editable=False)
     objects = ProductManager()
+    # All concrete fields: save() writes only the changed ones, and the
+    # previous facet values are needed to keep ProductFacetCount
+    tracker = FieldTracker()
+    thumbnail_source_fields = (
+        'front_image_large', 'back_image_large',
+        'bg_removed_front_image_large', 'bg_removed_back_image_large')
+
+    class Meta:
+        indexes = [
+            GinIndex(
+                fields=['match_vector'], name='product_match_vector_gin'),
+            models.Index(
+                fields=['-created', 'id'], name='product_created_id_idx'),
+            GinIndex(
+                fields=['search_vector'], name='product_search_vector_gin'),
+            GinIndex(
+                fields=['title'], name='product_title_trgm',
+                opclasses=['gin_trgm_ops']),
+        ]
 
     def save(self, *args, **kwargs):
         self.slug = slugify(self.title)
+        self.match_vector = get_match_vector(self)
         if not isinstance(self.bg_removal_details, dict):
             self.bg_removal_details = {}
 
@@ -309,30 +344,44 @@ class Product(TimeStampedModel, AuthStampedModel):
             'front_source': 'bg_removed_front_image_large',
             'back_source': 'bg_removed_back_image_large',
         }
+        sources = []
         for key, attr_name in __mappings.items():
             if key not in self.bg_removal_details:
                 continue
             resized_filename = self.bg_removal_details[key]
             if os.path.isfile(resized_filename):
-                setattr(
-                    self,
-                    attr_name,
-                    ContentFile(
-                        open(resized_filename, 'rb').read(),
-                        os.path.basename(resized_filename)
-                    ))
+                # Streamed to storage instead of read into memory
+                source = File(
+                    open(resized_filename, 'rb'),
+                    os.path.basename(resized_filename))
+                sources.append(source)
+                setattr(self, attr_name, source)
             else:
                 del self.bg_removal_details[key]
 
-        if self.pk:
-            old = self.__class__.objects.get(pk=self.pk)
-            changed_fields = []
-            for field in self.__class__._meta.get_fields():
-                field_name = field.name
-                if getattr(old, field_name) != getattr(self, field_name):
-                    changed_fields.append(field_name)
-            kwargs['update_fields'] = changed_fields
-        super().save(*args, **kwargs)
+        if self.pk and not self._state.adding and \
+                kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = self.get_changed_fields()
+        try:
+            super().save(*args, **kwargs)
+        finally:
+            for source in sources:
+                source.close()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            # The tracker only resets the update_fields it tracks by that
+            # name, foreign keys are tracked by attname (brand_id)
+            self.tracker.set_saved_fields(fields=[
+                self._meta.get_field(name).attname
+                for name in update_fields])
+
+    def get_changed_fields(self) -> List[str]:
+        """
+        Names of the concrete fields changed since the instance was loaded
+        or last saved, compared against the tracker's snapshot, no SELECT.
+        """
+        names = {field.attname: field.name for field in self._meta.fields}
+        return [names[attname] for attname in self.tracker.changed()]
 
     @property
     def progress(self) -> str:
@@ -398,23 +447,22 @@ class Product(TimeStampedModel, AuthStampedModel):
         else:
             return None
 
+    def get_thumbnail_sources(self):
+        # TODO: temporarily remove bg removal, small images should come from
+        # bg_removed_front_image_large / bg_removed_back_image_large
+        return {
+            'front_image_small': (
+                self.front_image_large, settings.THUMBNAIL_SMALL_IMAGE_SIZE),
+            'back_image_small': (
+                self.back_image_large, settings.THUMBNAIL_SMALL_IMAGE_SIZE),
+            'front_image_thumbnail': (
+                self.bg_removed_front_image_large,
+                settings.THUMBNAIL_TINY_IMAGE_SIZE),
+        }
+
     @property
     def front_image_small(self) -> Optional[str]:
-        # TODO: temporarily remove bg removal
-        # if not self.bg_removed_front_image_large:
-        #     return None
-        # return get_thumbnail(
-        #     self.bg_removed_front_image_large,
-        #     settings.THUMBNAIL_SMALL_IMAGE_SIZE,
-        #     crop='center', quality=99
-        # ).url
-        if not self.front_image_large:
-            return None
-        return get_thumbnail(
-            self.front_image_large,
-            settings.THUMBNAIL_SMALL_IMAGE_SIZE,
-            crop='center', quality=99
-        ).url
+        return self.get_thumbnail_url('front_image_small')
 
     @property
     def shipping_item_name(self) -> str:
@@ -427,31 +475,11 @@ class Product(TimeStampedModel, AuthStampedModel):
 
     @property
     def front_image_thumbnail(self) -> Optional[str]:
-        if not self.bg_removed_front_image_large:
-            return None
-        return get_thumbnail(
-            self.bg_removed_front_image_large,
-            settings.THUMBNAIL_TINY_IMAGE_SIZE,
-            crop='center', quality=99
-        ).url
+        return self.get_thumbnail_url('front_image_thumbnail')
 
     @property
     def back_image_small(self) -> Optional[str]:
-        # TODO: temporarily remove bg removal
-        # if not self.bg_removed_back_image_large:
-        #     return None
-        # return get_thumbnail(
-        #     self.bg_removed_back_image_large,
-        #     settings.THUMBNAIL_SMALL_IMAGE_SIZE,
-        #     crop='center', quality=99
-        # ).url
-        if not self.back_image_large:
-            return None
-        return get_thumbnail(
-            self.back_image_large,
-            settings.THUMBNAIL_SMALL_IMAGE_SIZE,
-            crop='center', quality=99
-        ).url
+        return self.get_thumbnail_url('back_image_small')
 
     def thumbnail(self) -> str:
         thumbnail_src = self.front_image_thumbnail \
@@ -463,7 +491,7 @@ class Product(TimeStampedModel, AuthStampedModel):
             return mark_safe('<br />')
 
 
-class ProductImage(TimeStampedModel, AuthStampedModel):
+class ProductImage(ThumbnailMixin, TimeStampedModel, AuthStampedModel):
     BG_REMOVAL_STATUS_CHOICES = (
         (BG_REMOVAL_STATUS.to_do, _('to do')),
         (BG_REMOVAL_STATUS.pending, _('pending')),
@@ -498,30 +526,83 @@ class ProductImage(TimeStampedModel, AuthStampedModel):
 
     bg_removal_details = JSONField(default=None, null=True, blank=True)
 
-    @property
-    def image_small(self):
-        if not self.image_large:
-            return None
-        current_image = self.image_large
+    thumbnails_generated_at = models.DateTimeField(
+        null=True, blank=True, editable=False)
+
+    # Perceptual (dHash) and byte (sha256) hashes of image_large
+    image_hash = models.BigIntegerField(
+        null=True, blank=True, editable=False, db_index=True)
+    image_sha256 = models.CharField(
+        max_length=64, null=True, blank=True, editable=False)
+    # Where a bulk imported image is fetched from, see finish_product_import
+    source_url = models.URLField(
+        max_length=2048, null=True, blank=True, editable=False)
+
+    thumbnail_source_fields = ('image_large', 'bg_removed_image_large')
+    tracker = FieldTracker(
+        fields=thumbnail_source_fields + ('bg_removal_status',))
 
-        if self.bg_removed_image_large:
-            current_image = self.bg_removed_image_large
+    def save(self, *args, **kwargs):
+        self.set_image_hashes()
+        super().save(*args, **kwargs)
 
-        return get_thumbnail(
-            current_image,
-            settings.THUMBNAIL_SMALL_IMAGE_SIZE,
-            crop='center', quality=99
-        ).url
+    def set_image_hashes(self) -> bool:
+        """ See `hash_images`, True when a stored image was reused """
+        return bool(self.hash_images([self]))
+
+    @classmethod
+    def hash_images(cls, images: List['ProductImage']) -> List['ProductImage']:
+        """
+        Hashes the newly assigned image_large of `images`. In content
+        addressed mode identical images already in storage are reused,
+        thumbnails included, instead of storing another copy. They are
+        looked up with one query for all `images`, which are returned.
+        """
+        hashed = [
+            image for image in images
+            if image.image_large and not image.image_large._committed]
+        for image in hashed:
+            image.image_hash, image.image_sha256 = get_image_hashes(
+                image.image_large.file)
+        if not hashed or not settings.PRODUCT_IMAGE_CONTENT_ADDRESSED:
+            return []
+
+        existing = {}
+        for row in cls.objects.filter(
+            image_sha256__in={image.image_sha256 for image in hashed},
+        ).exclude(image_large='').exclude(image_large__isnull=True).values(
+                'image_hash', 'image_sha256', 'image_large',
+                'thumbnails_generated_at'):
+            existing.setdefault((row['image_hash'], row['image_sha256']), row)
+
+        reused = []
+        for image in hashed:
+            row = existing.get((image.image_hash, image.image_sha256))
+            if row:
+                image.image_large = row['image_large']
+                image.thumbnails_generated_at = row['thumbnails_generated_at']
+                reused.append(image)
+        return reused
+
+    def get_thumbnail_sources(self):
+        current_image = None
+        if self.image_large:
+            current_image = self.bg_removed_image_large or self.image_large
+        return {
+            'image_small': (
+                current_image, settings.THUMBNAIL_SMALL_IMAGE_SIZE),
+            'image_thumbnail': (
+                self.bg_removed_image_large,
+                settings.THUMBNAIL_TINY_IMAGE_SIZE),
+        }
+
+    @property
+    def image_small(self):
+        return self.get_thumbnail_url('image_small')
 
     @property
     def image_thumbnail(self) -> Optional[str]:
-        if not self.bg_removed_image_large:
-            return None
-        return get_thumbnail(
-            self.bg_removed_image_large,
-            settings.THUMBNAIL_TINY_IMAGE_SIZE,
-            crop='center', quality=99
-        ).url
+        return self.get_thumbnail_url('image_thumbnail')
 
     @property
     def status_cache_id(self):
@@ -545,6 +626,21 @@ class ProductImage(TimeStampedModel, AuthStampedModel):
         else:
             return mark_safe('<br />')
 
+    @transition(
+        'bg_removal_status',
+        source=[
+            BG_REMOVAL_STATUS.to_do, BG_REMOVAL_STATUS.done,
+            BG_REMOVAL_STATUS.failed],
+        target=BG_REMOVAL_STATUS.pending
+    )
+    def request_to_remove_background(self, raise_exception: bool = False):
+        # Queued once the transaction commits, the task id is known before
+        task_id = uuid.uuid4()
+        self.bg_removal_task_uuid = task_id
+        transaction.on_commit(
+            lambda: remove_background_from_product_single_image.apply_async(
+                (self.pk, raise_exception), task_id=str(task_id)))
+
     @transition(
         'bg_removal_status',
         source=[BG_REMOVAL_STATUS.to_do, BG_REMOVAL_STATUS.pending],
@@ -567,14 +663,83 @@ class ProductImage(TimeStampedModel, AuthStampedModel):
         target=BG_REMOVAL_STATUS.failed
     )
     def failed_to_remove_background(self, err: Exception):
-        self.bg_removal_details = self.bg_removal_details or {}.update({
-            'error': str(err)
-        })
+        details = self.bg_removal_details or {}
+        details['error'] = str(err)
+        self.bg_removal_details = details
+        cache.delete(self.status_cache_id)
 
-    # def request_to_remove_background(self, raise_exception: bool = False):
-    #     task = remove_background_from_product_single_image.apply_async(
-    #         (self.pk, raise_exception), countdown=2)
-        # self.bg_removal_task_uuid = task.i
+
+class BackgroundRemovalJob(TimeStampedModel, AuthStampedModel):
+    """
+    Background removal of several ProductImages, run as one batched
+    inference. The status of every image is kept on this single row.
+    """
+    STATUS_CHOICES = (
+        (BG_REMOVAL_STATUS.pending, _('pending')),
+        (BG_REMOVAL_STATUS.in_progress, _('in progress')),
+        (BG_REMOVAL_STATUS.done, _('done')),
+        (BG_REMOVAL_STATUS.failed, _('failed')),
+    )
+
+    # Images in these states can be added to a job
+    REQUESTABLE_STATUSES = (
+        BG_REMOVAL_STATUS.to_do, BG_REMOVAL_STATUS.done,
+        BG_REMOVAL_STATUS.failed)
+    # Not run by the job, the image was no longer waiting when it started
+    IMAGE_SKIPPED = 's'
+
+    status = FSMField(
+        choices=STATUS_CHOICES, default=BG_REMOVAL_STATUS.pending)
+    # {image pk: bg_removal_status or IMAGE_SKIPPED}
+    image_statuses = JSONField(default=dict)
+    task_uuid = models.UUIDField(
+        blank=True, null=True, verbose_name=_('background removal task id'))
+    finished_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Background Removal Job"
+        verbose_name_plural = "Background Removal Jobs"
+
+    def __str__(self):
+        return f"{self.pk} ({len(self.image_statuses)} images)"
+
+    @property
+    def image_ids(self) -> List[int]:
+        return [int(pk) for pk in self.image_statuses]
+
+    def enqueue(self, raise_exception: bool = False):
+        task_id = uuid.uuid4()
+        self.task_uuid = task_id
+        transaction.on_commit(
+            lambda: run_background_removal_job.apply_async(
+                (self.pk, raise_exception), task_id=str(task_id)))
+
+    @transition(
+        'status',
+        source=[BG_REMOVAL_STATUS.pending],
+        target=BG_REMOVAL_STATUS.in_progress
+    )
+    def started(self):
+        for pk in self.image_statuses:
+            self.image_statuses[pk] = BG_REMOVAL_STATUS.in_progress
+
+    @transition(
+        'status',
+        source=[BG_REMOVAL_STATUS.in_progress],
+        target=BG_REMOVAL_STATUS.done
+    )
+    def finished(self):
+        self.finished_at = now()
+
+    @transition(
+        'status',
+        source=[BG_REMOVAL_STATUS.in_progress],
+        target=BG_REMOVAL_STATUS.failed
+    )
+    def failed(self, err: Exception):
+        self.finished_at = now()
+        self.error = str(err)
 
 
 class BundleReport(TimeStampedModel, AuthStampedModel):
@@ -623,6 +788,21 @@ class BundleRating(TimeStampedModel, AuthStampedModel):
         return f"{self.rating} {self.bundle}"
 
 
+class ProductFacetCount(models.Model):
+    """ Number of products per filter value, see app.facets """
+    facet = models.CharField(max_length=32)
+    value = models.CharField(max_length=255)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Product Facet Count"
+        verbose_name_plural = "Product Facet Counts"
+        unique_together = ('facet', 'value')
+
+    def __str__(self):
+        return f"{self.facet}={self.value} ({self.count})"
+
+
 class ProductCategory(MPTTModel, TimeStampedModel):
     """ Product Categories """
     name = models.CharField(max_length=255)
@@ -684,6 +864,11 @@ class ProductBrand(MPTTModel, TimeStampedModel):
     class Meta:
         verbose_name = "Product Brand"
         verbose_name_plural = "Product Brands"
+        indexes = [
+            GinIndex(
+                fields=['name'], name='productbrand_name_trgm',
+                opclasses=['gin_trgm_ops']),
+        ]
 
     def save(self, *args, **kwargs):
 
@@ -1,6 +1,7 @@
-from django.db.models import Count, Q
 from rest_framework.filters import OrderingFilter
 
+from app.utils.relevance import annotate_relevance, get_match_tokens
+
 # Documentation
 # https://docs.google.com/document/d/1O-Qyo9ZOA8Ueqc42PnzBxZfg6nRk9wnXDT_MdEBhXI8/edit
 
@@ -11,42 +12,32 @@ class ProductOrderingFilter(OrderingFilter):
         'category', 'size',
         'brand', 'gender']
 
+    def get_match_tokens(self, request):
+        return get_match_tokens({
+            attr: request.query_params.getlist(attr)
+            for attr in self.allowed_custom_filters
+        })
+
     def filter_item_match(self, request, queryset):
-        # Filter by Count of Products where (Category AND Size AND Brand) > 0
-        ordering = [f for f in request.query_params.keys(
-        ) if f in self.allowed_custom_filters]
-
-        if len(ordering) > 0:
-            param_dict = dict(request.query_params)
-
-            query_dict = {}
-            for attr, values in param_dict.items():
-                if attr in self.allowed_custom_filters:
-                    query_dict.update({
-                        f'{attr}__in': values
-                    })
-
-            queryset = queryset.annotate(
-                matched_items=Count(Q(**query_dict)))
+        # Keep Products matching any of the requested Category/Size/Brand/
+        # Gender values, scored by the number of matched attributes
+        tokens = self.get_match_tokens(request)
+        if tokens:
+            queryset = annotate_relevance(queryset, tokens)
         return queryset
 
     def order_by_relevance(self, request, queryset):
-        # Order by Count of Products where (Category AND Size AND Brand) match
-        ordering = [f for f in request.query_params.keys(
-        ) if f in self.allowed_custom_filters]
-        query_dict = {}
-        if len(ordering) > 0:
-            param_dict = dict(request.query_params)
-            for attr, values in param_dict.items():
-                if attr in self.allowed_custom_filters:
-                    query_dict.update({
-                        f'{attr}__in': values
-                    })
-
-            queryset = queryset.annotate(
-                matched_items=Count(Q(**query_dict))).order_by(
-                '-matched_items', '-platform_margin',)
-        return queryset.filter(Q(**query_dict))
+        # Order by the number of matched attributes, scored from the
+        # precomputed match vector instead of a GROUP BY over the catalog
+        queryset = annotate_relevance(
+            queryset, self.get_match_tokens(request))
+        # NOTE: Keep in sync with ProductFeedPagination.ordering, the cursor
+        # is keyed on these columns.
+        ordering = ('-matched_items', '-created', 'pk')
+        if 'search_rank' in queryset.query.annotations:
+            # Ranked by ProductSearchFilter
+            ordering = ('-search_rank',) + ordering
+        return queryset.order_by(*ordering)
 
     def filter_queryset(self, request, queryset, view):
         ordering_selection = request.query_params.get(self.ordering_param)
@@ -1,7 +1,153 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 
 class StandardResultsSetPagination(PageNumberPagination):
     page_size = 20
     page_size_query_param = 'page_size'
     max_page_size = 1000
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination over a composite key.
+
+    The cursor keeps the key values of the edge row of the current page, so
+    each page is fetched with a range condition on the ordering columns
+    instead of an OFFSET, and no COUNT(*) is ever issued.
+    The queryset ordering is used as the key, `ordering` is the fallback.
+    """
+    ordering = ('-created', 'pk')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+    def get_ordering(self, request, queryset, view):
+        ordering = list(queryset.query.order_by)
+        if not ordering or not all(isinstance(f, str) for f in ordering):
+            ordering = list(self.ordering)
+        if not {'pk', '-pk', 'id', '-id'} & set(ordering):
+            ordering.append('pk')
+        return tuple(ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse, position = self.cursor or (False, None)
+
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(self._invert(field) for field in ordering)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(
+                self.get_keyset_filter(ordering, position))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+        return self.page
+
+    def get_keyset_filter(self, ordering, position) -> Q:
+        """
+        Rows strictly after `position` in `ordering`, i.e.
+        (a < x) OR (a = x AND b < y) OR (a = x AND b = y AND c > z) ...
+        """
+        condition, equal = Q(), Q()
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def get_position_from_instance(self, instance, ordering):
+        return [getattr(instance, field.lstrip('-')) for field in ordering]
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        position = self.get_position_from_instance(
+            self.page[-1], self.ordering)
+        return self.encode_cursor((False, position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        position = self.get_position_from_instance(
+            self.page[0], self.ordering)
+        return self.encode_cursor((True, position))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            payload = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+            reverse, position = bool(payload['r']), list(payload['p'])
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return reverse, position
+
+    def encode_cursor(self, cursor):
+        reverse, position = cursor
+        payload = json.dumps(
+            {'r': int(reverse), 'p': position},
+            cls=DjangoJSONEncoder, separators=(',', ':'))
+        encoded = urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded)
+
+    @staticmethod
+    def _invert(field: str) -> str:
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+
+class ProductFeedPagination(KeysetPagination):
+    """
+    Infinite scroll for the product feed, keyed on relevance then recency.
+    Clients that explicitly send `page` keep the page-number pagination.
+    """
+    ordering = ('-matched_items', '-created', 'pk')
+    page_number_pagination_class = StandardResultsSetPagination
+
+    page_number_paginator = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_query_param = self.page_number_pagination_class.page_query_param
+        if page_query_param in request.query_params:
+            self.page_number_paginator = self.page_number_pagination_class()
+            return self.page_number_paginator.paginate_queryset(
+                queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.page_number_paginator:
+            return self.page_number_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def to_html(self):
+        if self.page_number_paginator:
+            return self.page_number_paginator.to_html()
+        return super().to_html()
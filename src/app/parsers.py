@@ -0,0 +1,54 @@
+"""
+Parsers for bulk product imports, both return a list of row dicts.
+"""
+import csv
+import io
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+def _read_text(stream, parser_context) -> str:
+    encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+    try:
+        return stream.read().decode(encoding)
+    except UnicodeDecodeError as e:
+        raise ParseError(f'Invalid {encoding} text - {e}')
+
+
+class CSVParser(BaseParser):
+    """ A header row, then one row per item. Empty cells are left out """
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        reader = csv.DictReader(io.StringIO(_read_text(stream, parser_context)))
+        try:
+            return [
+                {key.strip(): value for key, value in row.items()
+                 if key and value not in (None, '')}
+                for row in reader
+            ]
+        except csv.Error as e:
+            raise ParseError(f'CSV parse error on line {reader.line_num} - {e}')
+
+
+class JSONLinesParser(BaseParser):
+    """ One JSON object per line, blank lines are skipped """
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        rows = []
+        text = _read_text(stream, parser_context)
+        for line_num, line in enumerate(text.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                raise ParseError(f'JSON parse error on line {line_num} - {e}')
+            if not isinstance(row, dict):
+                raise ParseError(f'Line {line_num} is not a JSON object')
+            rows.append(row)
+        return rows
@@ -0,0 +1,73 @@
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVector, TrigramSimilarity)
+from django.db.models import F, FloatField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Cast, Coalesce
+from rest_framework.filters import SearchFilter
+
+SEARCH_CONFIG = 'english'
+
+# Fields that feed Product.search_vector, a save touching none of them keeps
+# the current document.
+SEARCH_VECTOR_SOURCE_FIELDS = {
+    'title', 'brand', 'category', 'size', 'bundle', 'search_vector'}
+
+
+def get_search_vector(model):
+    bundle_model = model._meta.get_field('bundle').related_model
+    tags = bundle_model.objects.filter(
+        pk=OuterRef('bundle_id')
+    ).annotate(
+        names=StringAgg('tags__name', delimiter=' ')
+    ).values('names')
+
+    return (
+        SearchVector('title', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('brand__name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('category__name', weight='B', config=SEARCH_CONFIG)
+        + SearchVector(Subquery(tags), weight='B', config=SEARCH_CONFIG)
+        + SearchVector('size__name', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(queryset) -> int:
+    """
+    Recomputes `search_vector` for the products in `queryset` with a single
+    UPDATE, the document is built by a correlated subquery since UPDATE
+    can't join brand, category, size and tags directly.
+    """
+    model = queryset.model
+    documents = model.objects.filter(
+        pk=OuterRef('pk')
+    ).annotate(
+        document=get_search_vector(model)
+    ).values('document')
+    return queryset.update(search_vector=Subquery(documents))
+
+
+class ProductSearchFilter(SearchFilter):
+    """
+    Ranked full-text search over `Product.search_vector`, brands are also
+    matched by trigram similarity so misspelled brand names still hit.
+    Annotates `search_rank`, which ProductOrderingFilter orders by.
+    """
+
+    def get_search_text(self, request) -> str:
+        return ' '.join(self.get_search_terms(request))
+
+    def filter_queryset(self, request, queryset, view):
+        search = self.get_search_text(request)
+        if not search:
+            return queryset
+
+        query = SearchQuery(
+            search, search_type='websearch', config=SEARCH_CONFIG)
+        # Cast to double precision so the rank round-trips exactly through
+        # the feed cursor.
+        rank = Cast(
+            Coalesce(SearchRank(F('search_vector'), query), Value(0.0))
+            + Coalesce(TrigramSimilarity('brand__name', search), Value(0.0)),
+            output_field=FloatField())
+        return queryset.filter(
+            Q(search_vector=query) | Q(brand__name__trigram_similar=search)
+        ).annotate(search_rank=rank)
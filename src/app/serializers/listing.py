@@ -1,9 +1,13 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core import signing
 from django.utils.translation import gettext_lazy as _
 from django.shortcuts import get_object_or_404
+from django.db import transaction
 from django.db.models import Q
 
 from rest_framework import serializers
+from rest_framework.exceptions import NotFound
 from rest_framework.validators import UniqueTogetherValidator
 import stripe
 from djstripe import models
@@ -12,19 +16,31 @@ from app.models.product import (
     PRODUCT_STATUS, Bundle, Product,
     BundleReport, BundleRating,
     ProductCategory, ProductBrand,
-    ProductSize, ProductImage
+    ProductSize, ProductImage,
+    BG_REMOVAL_STATUS, BackgroundRemovalJob
 )
+from app.facets import FACET_FIELDS, get_facet_values
 from app.paginations import StandardResultsSetPagination
 from app.serializers.tag import ByndeTagListSerializer
 from app.utils.address import Address, validate_address
+from app.utils.cache import bump_versions, get_product_feed_tags
+from app.utils.images import normalize_image
+from app.utils.progress import publish_bg_removal_progress
 from app.serializers.user import ProfileSerializer
 from app.serializers.shipment import ShipmentSerializer
+from app.services.listing import bulk_import_products
+from app.services.uploads import (
+    IMAGE_CONTENT_TYPES, IMAGE_FORMATS, attach_uploaded_image,
+    consume_upload, get_uploaded_image_format, get_uploaded_object,
+    load_upload_token)
 from app.utils import (
     Base64ImageField,
     inline_serializer,
-    RecursiveFieldSerializer
+    RecursiveFieldSerializer,
+    ThumbnailListSerializer,
+    UploadedImageField
 )
-from app.tasks import send_email, send_pepo_email
+from app.tasks import generate_item_thumbnails, send_email, send_pepo_email
 
 
 class TagsField(serializers.Field):
@@ -158,7 +174,7 @@ class ProductSizeShortSerializer(serializers.ModelSerializer):
 
 class ProductImageSerializer(serializers.ModelSerializer):
     image_large = Base64ImageField(
-        max_length=None, use_url=True, required=False)
+        max_length=None, use_url=True, required=False, normalize=True)
 
     bg_removed_image_large = Base64ImageField(
         max_length=None, use_url=True, required=False)
@@ -198,6 +214,248 @@ class ProductImageSerializer(serializers.ModelSerializer):
         fields = ("image_large", "id", "image_small", "bg_removed_image_large")
 
 
+class ProductImageUploadSerializer(serializers.ModelSerializer):
+    """ Multipart ProductImage upload, see ProductImageUploadView """
+    image_large = UploadedImageField(use_url=True)
+    product = serializers.PrimaryKeyRelatedField(
+        queryset=Product.objects.all(), required=False, allow_null=True)
+
+    def validate_image_large(self, image):
+        # Stored upright, downscaled and without metadata
+        return normalize_image(image).file
+
+    def validate_product(self, product):
+        user = self.context['request'].user
+        if product is not None and product.created_by_id != user.pk:
+            raise serializers.ValidationError(
+                'You can only add images to your own products')
+        return product
+
+    class Meta:
+        model = ProductImage
+        fields = ("id", "product", "image_large", "image_small")
+        read_only_fields = ("id", "image_small")
+
+
+class ProductImagePresignSerializer(serializers.Serializer):
+    """ Requests a presigned POST for a direct-to-S3 image upload """
+    filename = serializers.CharField(max_length=255)
+    content_type = serializers.ChoiceField(
+        choices=IMAGE_CONTENT_TYPES)
+
+
+class ProductImageConfirmSerializer(serializers.Serializer):
+    """
+    Attaches an image uploaded through a presigned POST to a new
+    ProductImage, once the object is found in the bucket.
+    """
+    token = serializers.CharField()
+    product = serializers.PrimaryKeyRelatedField(
+        queryset=Product.objects.all(), required=False, allow_null=True)
+
+    validate_product = ProductImageUploadSerializer.validate_product
+
+    def validate_token(self, token):
+        user = self.context['request'].user
+        try:
+            upload = load_upload_token(token=token)
+        except signing.BadSignature:
+            raise serializers.ValidationError('Invalid or expired upload token')
+        if upload['user'] != user.pk:
+            raise serializers.ValidationError('Invalid or expired upload token')
+
+        uploaded = get_uploaded_object(key=upload['key'])
+        if uploaded is None:
+            raise serializers.ValidationError('The image was not uploaded')
+        if uploaded['ContentLength'] > settings.PRODUCT_IMAGE_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError('The image is too large')
+        # The stored Content-Type is the client's, read the bytes instead
+        if get_uploaded_image_format(key=upload['key']) not in IMAGE_FORMATS:
+            raise serializers.ValidationError('Unsupported image type')
+        # Last, a valid token may be retried until the upload is there
+        if not consume_upload(key=upload['key']):
+            raise serializers.ValidationError('The upload was already confirmed')
+        return upload['key']
+
+    def create(self, validated_data):
+        return attach_uploaded_image(
+            user=self.context['request'].user,
+            key=validated_data['token'],
+            product=validated_data.get('product'))
+
+    def to_representation(self, instance):
+        # Thumbnails are rendered in the background, don't wait for them
+        return {
+            'id': instance.pk,
+            'product': instance.product_id,
+            'image_large': instance.image_large.url,
+        }
+
+
+class BackgroundRemovalJobSerializer(serializers.ModelSerializer):
+    """
+    Removes the background of several ProductImages of the user in one
+    job. Progress of every image is read from the job, not per image.
+    """
+    images = serializers.ListField(
+        child=serializers.IntegerField(), write_only=True, min_length=1,
+        max_length=settings.BG_REMOVAL_JOB_MAX_IMAGES)
+
+    def get_requestable_images(self, images):
+        return ProductImage.objects.filter(
+            pk__in=images,
+            created_by=self.context['request'].user,
+            bg_removal_status__in=BackgroundRemovalJob.REQUESTABLE_STATUSES,
+        ).exclude(image_large='')
+
+    def validate_images(self, images):
+        images = list(dict.fromkeys(images))
+        found = set(self.get_requestable_images(images).values_list(
+            'pk', flat=True))
+        missing = [pk for pk in images if pk not in found]
+        if missing:
+            raise serializers.ValidationError(
+                f'Images not found or already in progress: {missing}')
+        return images
+
+    def create(self, validated_data):
+        images = validated_data.pop('images')
+        job = BackgroundRemovalJob(
+            image_statuses={
+                str(pk): BG_REMOVAL_STATUS.pending for pk in images},
+            **validated_data)
+        # The update skips post_save, progress streams are told here
+        pending = [
+            ProductImage(pk=pk, bg_removal_status=BG_REMOVAL_STATUS.pending)
+            for pk in images]
+        # The task is queued on commit, after the images are marked
+        with transaction.atomic():
+            # Locked and checked again, a concurrent job may have taken some
+            requestable = self.get_requestable_images(images)
+            list(requestable.select_for_update().values_list('pk', flat=True))
+            transaction.on_commit(
+                lambda: publish_bg_removal_progress(*pending))
+            job.save()
+            job.enqueue()
+            job.save(update_fields=['task_uuid'])
+            # One UPDATE instead of a transition and save per image
+            updated = requestable.update(
+                bg_removal_status=BG_REMOVAL_STATUS.pending,
+                bg_removal_task_uuid=job.task_uuid)
+            if updated != len(images):
+                # Rolls back the job, its task is never queued
+                raise serializers.ValidationError(
+                    {'images': 'Some images are already in progress'})
+        return job
+
+    class Meta:
+        model = BackgroundRemovalJob
+        fields = (
+            'id', 'images', 'status', 'image_statuses', 'error',
+            'created', 'finished_at')
+        read_only_fields = (
+            'status', 'image_statuses', 'error', 'created', 'finished_at')
+
+
+class ImageURLListField(serializers.ListField):
+    """ A list of URLs, or a string of them separated by spaces or `|` """
+    child = serializers.URLField(max_length=2048)
+
+    def to_internal_value(self, data):
+        if isinstance(data, str):
+            data = data.replace('|', ' ').split()
+        return super().to_internal_value(data)
+
+
+class ProductImportRowSerializer(serializers.Serializer):
+    """ An item of a bulk import, rows with an `id` update that item """
+    id = serializers.IntegerField(required=False)
+    title = serializers.CharField(max_length=200, required=False)
+    gender = serializers.ChoiceField(
+        choices=Product.GENDER_CHOICES, required=False)
+    quality = serializers.ChoiceField(
+        choices=Product.QUALITY_CHOICES, required=False)
+    # Checked for all rows at once by ProductImportSerializer
+    brand = serializers.IntegerField(
+        source='brand_id', required=False, allow_null=True)
+    category = serializers.IntegerField(
+        source='category_id', required=False, allow_null=True)
+    size = serializers.IntegerField(
+        source='size_id', required=False, allow_null=True)
+    image_urls = ImageURLListField(
+        required=False, max_length=settings.PRODUCT_IMPORT_MAX_IMAGES)
+
+    def validate(self, attrs):
+        if 'id' not in attrs and not attrs.get('title'):
+            raise serializers.ValidationError(
+                {'title': 'This field is required for new items.'})
+        return attrs
+
+
+class ProductImportSerializer(serializers.Serializer):
+    """
+    Validates every row of a bulk import before anything is written, see
+    bulk_import_products. Related objects are looked up with one query
+    per model, not per row.
+    """
+    bundle = serializers.PrimaryKeyRelatedField(
+        queryset=Bundle.objects.all(), required=False, allow_null=True)
+    rows = ProductImportRowSerializer(many=True, allow_empty=False)
+
+    def validate_bundle(self, bundle):
+        user = self.context['request'].user
+        if bundle is not None and bundle.created_by_id != user.pk:
+            raise serializers.ValidationError(
+                'You can only import items into your own bundles')
+        return bundle
+
+    def validate_rows(self, rows):
+        if len(rows) > settings.PRODUCT_IMPORT_MAX_ROWS:
+            raise serializers.ValidationError(
+                f'At most {settings.PRODUCT_IMPORT_MAX_ROWS} rows per import')
+
+        errors = [{} for _ in rows]
+        lookups = (
+            ('brand', 'brand_id', ProductBrand.objects.all()),
+            ('category', 'category_id', ProductCategory.objects.all()),
+            ('size', 'size_id', ProductSize.objects.all()),
+            ('id', 'id', Product.objects.filter(
+                created_by=self.context['request'].user)),
+        )
+        for name, key, queryset in lookups:
+            pks = {row[key] for row in rows if row.get(key) is not None}
+            if not pks:
+                continue
+            found = set(queryset.filter(pk__in=pks).values_list(
+                'pk', flat=True))
+            for error, row in zip(errors, rows):
+                if row.get(key) is not None and row[key] not in found:
+                    error[name] = [
+                        f'Invalid pk "{row[key]}" - object does not exist.']
+
+        seen = set()
+        for error, row in zip(errors, rows):
+            if 'id' in row and row['id'] in seen:
+                error['id'] = ['The item is already updated by another row.']
+            seen.add(row.get('id'))
+
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return rows
+
+    def create(self, validated_data):
+        return bulk_import_products(
+            user=self.context['request'].user,
+            rows=validated_data['rows'],
+            bundle=validated_data.get('bundle'))
+
+    def to_representation(self, instance):
+        # The images are fetched in the background, see finish_product_import
+        return {
+            'ids': [product.pk for product in instance],
+        }
+
+
 class ProductImageRetrivalSerializer(ProductImageSerializer):
     image_large = serializers.SerializerMethodField()
 
@@ -242,6 +500,8 @@ class BundleSerializer(serializers.ModelSerializer):
         model = Bundle
         fields = ('id', 'title', 'description', 'slug', 'status',
                   'buyer_price', 'tags', 'items')
+        list_serializer_class = ThumbnailListSerializer
+        thumbnail_relations = ('items', 'items__images')
 
 
 class BundlePurchaseSerializer(serializers.ModelSerializer):
@@ -499,6 +759,8 @@ class ProductSerializer(serializers.ModelSerializer):
                             'gender', 'quality', 'brand', 'category', 'size',
                             'images', 'favourite'
                             )
+        list_serializer_class = ThumbnailListSerializer
+        thumbnail_relations = ('images',)
 
 
 class SellingItemSerializer(ProductSerializer):
@@ -564,11 +826,24 @@ class SellingItemCreateSerializer(SellingItemSerializer):
         )
 
 
+class SellingItemImageSerializer(ProductImageSerializer):
+    """
+    Images of SellingItemDetailSerializer. Ids are checked for all the
+    images at once by `reconcile_images`, not with a query per image.
+    """
+
+    def validate(self, attrs):
+        return attrs
+
+    class Meta(ProductImageSerializer.Meta):
+        read_only_fields = ('image_small',)
+
+
 class SellingItemDetailSerializer(serializers.ModelSerializer):
     front_image_thumbnail = serializers.CharField()
     front_image_small = serializers.CharField()
 
-    images = ProductImageSerializer(many=True)
+    images = SellingItemImageSerializer(many=True)
 
     @property
     def _request(self):
@@ -582,32 +857,83 @@ class SellingItemDetailSerializer(serializers.ModelSerializer):
             )
         )
 
-    def update(self, instance, validated_data):
-        if 'images' in validated_data:
-            images = validated_data.pop("images")
-            if len(images):
-                # Get all the IDs for images
-                updated_images = self.filter_images_id(images)
-
-                # Find the Ids of images to remove
-                images_to_remove = instance.get_images_to_remove(
-                    updated_images)
-
-                # Detach images
-                instance.detach_images(images_to_remove)
-
-                # Create New Images
-                context = {
-                    "request": self._request,
-                    "product": instance
-                }
-                ser = ProductImageSerializer(
-                    data=images, context=context, many=True)
-                ser.is_valid(raise_exception=True)
-                ser.save()
+    def reconcile_images(self, instance, images):
+        """
+        Makes `images` the images of `instance` as one diff: a query loading
+        the current and requested images, then at most one detach, one
+        lookup of identical stored uploads, one bulk_create and one
+        bulk_update, whatever the number of images.
+        Images given by id must be this item's or not attached to any.
+        """
+        user = self._request.user
+        requested = set(self.filter_images_id(images))
+        loaded = ProductImage.objects.filter(
+            Q(product=instance) | Q(product=None, pk__in=requested)
+        ).in_bulk()
+        if requested - set(loaded):
+            raise NotFound('No ProductImage matches the given query.')
+
+        detached = [
+            pk for pk, image in loaded.items()
+            if image.product_id == instance.pk and pk not in requested]
+        if detached:
+            ProductImage.objects.filter(pk__in=detached).update(product=None)
+
+        created, changed, stored = [], [], []
+        for data in images:
+            data = dict(data)
+            pk = data.pop('id', None)
+            if pk is None:
+                image = ProductImage(product=instance, **data)
+                created.append(image)
             else:
-                instance.detach_all_images()
+                image = loaded[pk]
+                if image.product_id == instance.pk and not data:
+                    continue
+                image.product = instance
+                for attr, value in data.items():
+                    setattr(image, attr, value)
+                changed.append(image)
+            image.created_by = user
+            if data:
+                stored.append((image, set(data)))
+
+        # One lookup of identical stored images for all the uploads
+        reused = {id(image) for image in ProductImage.hash_images(
+            [image for image, _ in stored])}
+        for image, fields in stored:
+            # Only a reused image_large comes with its thumbnails
+            if id(image) not in reused or fields != {'image_large'}:
+                image.thumbnails_generated_at = None
+
+        # bulk_update doesn't store new files like save() does
+        for image in changed:
+            for field_name in image.thumbnail_source_fields:
+                file_ = getattr(image, field_name)
+                if file_ and not file_._committed:
+                    file_.save(file_.name, file_.file, save=False)
+        ProductImage.objects.bulk_create(created)
+        ProductImage.objects.bulk_update(changed, [
+            'product', 'created_by', 'image_large', 'bg_removed_image_large',
+            'image_hash', 'image_sha256', 'thumbnails_generated_at'])
+
+        # What the ProductImage post_save receivers do, once for all images
+        thumbnailed = [
+            image.pk for image, _ in stored
+            if not image.thumbnails_generated_at]
+        tags = get_product_feed_tags(get_facet_values({
+            attname: getattr(instance, attname)
+            for attname in FACET_FIELDS.values()}))
+
+        def on_commit():
+            bump_versions(tags)
+            for pk in thumbnailed:
+                generate_item_thumbnails.delay('productimage', pk)
+        transaction.on_commit(on_commit)
 
+    def update(self, instance, validated_data):
+        if 'images' in validated_data:
+            self.reconcile_images(instance, validated_data.pop('images'))
         return super().update(instance, validated_data)
 
     class Meta:
@@ -652,6 +978,8 @@ class SellingListSerializer(serializers.ModelSerializer):
         model = Bundle
         fields = ('pk', 'title', 'status', 'shipping_cost', 'shipping_type',
                   'description', 'seller_price', 'tags', 'items', 'seller_notes')
+        list_serializer_class = ThumbnailListSerializer
+        thumbnail_relations = ('items', 'items__images')
 
 
 class SellingDetailSerializer(serializers.ModelSerializer):
@@ -1 +1,4 @@
-from .listing import create_listing
+from .listing import bulk_import_products, create_listing
+from .uploads import (
+    attach_uploaded_image, consume_upload, create_image_upload,
+    get_uploaded_image_format, get_uploaded_object, load_upload_token)
@@ -1,7 +1,104 @@
+from collections import Counter
+from typing import Dict, List, Optional
+
+from django.db import transaction
+from django.utils.text import slugify
+from django.utils.timezone import now
+
+from app.facets import (
+    FACET_FIELDS, adjust_facet_counts, get_facet_deltas, get_facet_values)
 from app.models import *
+from app.tasks.catalog import finish_product_import
+from app.utils.cache import bump_versions, get_product_feed_tags, get_product_tag
+from app.utils.relevance import get_match_vector
+
+# Product attributes an import row may set
+PRODUCT_IMPORT_FIELDS = (
+    'title', 'gender', 'quality', 'brand_id', 'category_id', 'size_id')
+PRODUCT_IMPORT_BATCH_SIZE = 500
 
 
 def create_listing(*, title: str) -> Bundle:
     bundle = Bundle(title=title)
     # bundle.full_clean()
     bundle.save()
+
+
+def _get_facet_values(product: Product) -> Dict:
+    return {attname: getattr(product, attname)
+            for attname in FACET_FIELDS.values()}
+
+
+def bulk_import_products(
+        *, user, rows: List[Dict], bundle: Optional[Bundle] = None
+) -> List[Product]:
+    """
+    Creates the products of validated import rows, or updates those with
+    an `id`, with one bulk_create and one bulk_update. Their images are
+    created empty with a source_url. Product.save and the post_save
+    receivers are skipped: facet counts and cache versions are updated
+    once here, search vectors and images by finish_product_import.
+    """
+    existing = Product.objects.filter(created_by=user).in_bulk(
+        [row['id'] for row in rows if 'id' in row])
+
+    products, created, updated = [], [], []
+    deltas, facet_values = Counter(), []
+    modified = now()
+    for row in rows:
+        product = existing.get(row.get('id'))
+        if product is None:
+            product = Product(
+                created_by=user, bundle=bundle, bg_removal_details={})
+            created.append(product)
+            previous = {}
+        else:
+            if bundle is not None:
+                product.bundle = bundle
+            updated.append(product)
+            previous = _get_facet_values(product)
+
+        for attname in PRODUCT_IMPORT_FIELDS:
+            if attname in row:
+                setattr(product, attname, row[attname])
+        # What Product.save would have set
+        product.slug = slugify(product.title)
+        product.match_vector = get_match_vector(product)
+        product.modified = modified
+
+        current = _get_facet_values(product)
+        deltas.update(get_facet_deltas(previous, current))
+        facet_values += get_facet_values(previous) + get_facet_values(current)
+        products.append(product)
+
+    with transaction.atomic():
+        Product.objects.bulk_create(
+            created, batch_size=PRODUCT_IMPORT_BATCH_SIZE)
+        Product.objects.bulk_update(
+            updated, [
+                'title', 'gender', 'quality', 'brand', 'category', 'size',
+                'bundle', 'slug', 'match_vector', 'modified'],
+            batch_size=PRODUCT_IMPORT_BATCH_SIZE)
+
+        # Re-imported rows don't attach the same URL twice
+        attached = set(ProductImage.objects.filter(
+            product__in=updated, source_url__isnull=False,
+        ).values_list('product_id', 'source_url')) if updated else set()
+        images = ProductImage.objects.bulk_create([
+            ProductImage(product=product, source_url=url, created_by=user)
+            for product, row in zip(products, rows)
+            for url in dict.fromkeys(row.get('image_urls', []))
+            if (product.pk, url) not in attached
+        ], batch_size=PRODUCT_IMPORT_BATCH_SIZE)
+
+        adjust_facet_counts(
+            Counter({key: delta for key, delta in deltas.items() if delta}))
+
+        product_pks = [product.pk for product in products]
+        image_pks = [image.pk for image in images]
+        tags = [get_product_tag(pk) for pk in product_pks] + \
+            get_product_feed_tags(facet_values)
+        transaction.on_commit(lambda: bump_versions(tags))
+        transaction.on_commit(
+            lambda: finish_product_import.delay(product_pks, image_pks))
+    return products
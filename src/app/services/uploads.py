@@ -0,0 +1,124 @@
+import io
+from typing import Dict, Optional
+
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, UnidentifiedImageError
+
+from app.models import Product, ProductImage
+from app.models.product import get_upload_path
+from app.tasks.uploads import ingest_uploaded_image
+
+UPLOAD_TOKEN_SALT = 'app.services.uploads'
+
+# Same formats UploadedImageField accepts
+IMAGE_CONTENT_TYPES = ('image/jpeg', 'image/png', 'image/webp', 'image/gif')
+IMAGE_FORMATS = ('JPEG', 'PNG', 'WEBP', 'GIF')
+# Enough of the object for Pillow to identify the format from its header
+IMAGE_HEADER_SIZE = 64 * 1024
+UPLOAD_CONSUMED_KEY = 'upload:consumed:{key}'
+
+
+def get_upload_storage():
+    return default_storage
+
+
+def _get_client(storage):
+    return storage.connection.meta.client
+
+
+def create_image_upload(*, user, filename: str, content_type: str) -> Dict:
+    """
+    Reserves a `bundles/` key and returns a presigned POST the client
+    uploads the image to directly, plus a token to confirm it with.
+    """
+    storage = get_upload_storage()
+    key = get_upload_path(None, filename)
+    fields = {'Content-Type': content_type}
+    conditions = [
+        {'Content-Type': content_type},
+        ['content-length-range', 1, settings.PRODUCT_IMAGE_UPLOAD_MAX_SIZE],
+    ]
+    cache_control = settings.AWS_S3_OBJECT_PARAMETERS.get('CacheControl')
+    if cache_control:
+        fields['Cache-Control'] = cache_control
+        conditions.append({'Cache-Control': cache_control})
+
+    post = _get_client(storage).generate_presigned_post(
+        Bucket=storage.bucket_name,
+        Key=storage._normalize_name(key),
+        Fields=fields,
+        Conditions=conditions,
+        ExpiresIn=settings.PRODUCT_IMAGE_UPLOAD_EXPIRES,
+    )
+    token = signing.dumps({'key': key, 'user': user.pk}, salt=UPLOAD_TOKEN_SALT)
+    return {
+        'url': post['url'], 'fields': post['fields'],
+        'key': key, 'token': token,
+    }
+
+
+def load_upload_token(*, token: str) -> Dict:
+    """
+    Raises `signing.BadSignature` (or `SignatureExpired`) for tokens that
+    weren't issued by `create_image_upload` or are too old.
+    """
+    return signing.loads(
+        token, salt=UPLOAD_TOKEN_SALT,
+        max_age=settings.PRODUCT_IMAGE_UPLOAD_EXPIRES * 2)
+
+
+def get_uploaded_object(*, key: str) -> Optional[Dict]:
+    """ Metadata of the uploaded object, None if nothing was uploaded """
+    storage = get_upload_storage()
+    try:
+        return _get_client(storage).head_object(
+            Bucket=storage.bucket_name, Key=storage._normalize_name(key))
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey'):
+            return None
+        raise
+
+
+def get_uploaded_image_format(*, key: str) -> Optional[str]:
+    """
+    Format of the uploaded object sniffed from its first bytes, the
+    Content-Type of the object is whatever the client sent.
+    """
+    storage = get_upload_storage()
+    response = _get_client(storage).get_object(
+        Bucket=storage.bucket_name, Key=storage._normalize_name(key),
+        Range=f'bytes=0-{IMAGE_HEADER_SIZE - 1}')
+    try:
+        with Image.open(io.BytesIO(response['Body'].read())) as image:
+            return image.format
+    except (UnidentifiedImageError, OSError):
+        return None
+
+
+def consume_upload(*, key: str) -> bool:
+    """
+    Marks the key of a confirmed upload as used, False if it already was,
+    so a token can't attach the same object twice.
+    """
+    if not cache.add(
+            UPLOAD_CONSUMED_KEY.format(key=key), True,
+            timeout=settings.PRODUCT_IMAGE_UPLOAD_EXPIRES * 2):
+        return False
+    # The cache may be cleared (or a dummy one), the database is the backstop
+    return not ProductImage.objects.filter(image_large=key).exists()
+
+
+def attach_uploaded_image(
+        *, user, key: str, product: Optional[Product] = None
+) -> ProductImage:
+    image = ProductImage(product=product, created_by=user)
+    image.image_large.name = key
+    image.save()
+    # Never passed through the API, normalized and hashed from storage
+    transaction.on_commit(lambda: ingest_uploaded_image.delay(image.pk))
+    return image
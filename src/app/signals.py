@@ -1,11 +1,22 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.db import transaction
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
 from django.conf import settings
 from app.models.expiring import ExpiringToken
 from app.models.cart import Cart
 from app.models.product import Product, BG_REMOVAL_STATUS, ProductCategory, ProductBrand, ProductSize
-from cacheops import cache
+from app.models.product import Bundle, ProductImage
+from app.search import SEARCH_VECTOR_SOURCE_FIELDS, update_search_vectors
+from app.facets import (
+    FACET_FIELDS, adjust_facet_counts, get_facet_deltas, get_facet_values)
+from app.utils.cache import (
+    FEED_OPTIONS_TAG, OPTIONS_TAG, bump_versions, get_product_feed_tags,
+    get_product_tag)
+from app.utils.options import invalidate_option_trees
+from app.utils.progress import publish_bg_removal_progress
+from app.utils.thumbnails import has_thumbnail_sources
+from app.tasks.thumbnails import generate_item_thumbnails
 
 
 
@@ -66,4 +77,118 @@ def trigger_approved(sender, instance, created, **kwargs):
 @receiver([post_save, post_delete], sender=ProductBrand)
 @receiver([post_save, post_delete], sender=ProductCategory)
 def trigger_options_invalidation(sender, instance, **kwargs):
-    cache.delete('item_options')
+    invalidate_option_trees()
+    bump_versions([OPTIONS_TAG, FEED_OPTIONS_TAG])
+
+
+@receiver(post_save, sender=Product)
+def refresh_product_search_vector(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and \
+            not SEARCH_VECTOR_SOURCE_FIELDS & set(update_fields):
+        return
+    update_search_vectors(Product.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=ProductSize)
+@receiver(post_save, sender=ProductBrand)
+@receiver(post_save, sender=ProductCategory)
+def refresh_option_search_vectors(sender, instance, created, update_fields=None, **kwargs):
+    # Only the name is part of the product search document
+    if created or (update_fields is not None and 'name' not in update_fields):
+        return
+    update_search_vectors(instance.products.all())
+
+
+@receiver(m2m_changed, sender=Bundle.tags.through)
+def refresh_bundle_search_vectors(sender, instance, action, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if isinstance(instance, Bundle):
+        update_search_vectors(instance.items.all())
+
+
+def get_product_facet_values(instance, previous=False):
+    if previous:
+        return {
+            attname: instance.tracker.previous(attname)
+            for attname in FACET_FIELDS.values()}
+    return {
+        attname: getattr(instance, attname)
+        for attname in FACET_FIELDS.values()}
+
+
+@receiver(post_save, sender=Product)
+def update_product_facet_counts(sender, instance, created, **kwargs):
+    current = get_product_facet_values(instance)
+    previous = {} if created else get_product_facet_values(
+        instance, previous=True)
+    adjust_facet_counts(get_facet_deltas(previous, current))
+    bump_versions([get_product_tag(instance.pk)] + get_product_feed_tags(
+        get_facet_values(previous) + get_facet_values(current)))
+
+
+@receiver(post_delete, sender=Product)
+def release_product_facet_counts(sender, instance, **kwargs):
+    previous = get_product_facet_values(instance)
+    adjust_facet_counts(get_facet_deltas(previous, {}))
+    bump_versions([get_product_tag(instance.pk)] + get_product_feed_tags(
+        get_facet_values(previous)))
+
+
+@receiver([post_save, post_delete], sender=ProductImage)
+def invalidate_product_image_feeds(sender, instance, **kwargs):
+    if instance.product_id is None:
+        return
+    # The item's detail renders its images too
+    tags = [get_product_tag(instance.product_id)]
+    product = Product.objects.filter(pk=instance.product_id).values(
+        *FACET_FIELDS.values()).first()
+    if product:
+        tags += get_product_feed_tags(get_facet_values(product))
+    bump_versions(tags)
+
+
+@receiver(m2m_changed, sender=Product.favourite.through)
+def invalidate_favourite_feeds(sender, instance, action, pk_set=None, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if isinstance(instance, Product):
+        products = [get_product_facet_values(instance)]
+    else:
+        products = Product.objects.filter(pk__in=pk_set or ()).values(
+            *FACET_FIELDS.values())
+    bump_versions([
+        tag for product in products
+        for tag in get_product_feed_tags(get_facet_values(product))])
+
+
+def schedule_thumbnails(instance):
+    if not has_thumbnail_sources(instance):
+        return
+    model_name, pk = instance._meta.model_name, instance.pk
+    transaction.on_commit(
+        lambda: generate_item_thumbnails.delay(model_name, pk))
+
+
+@receiver(post_save, sender=Product)
+def trigger_product_thumbnails(sender, instance, created, update_fields=None, **kwargs):
+    if created or update_fields is None or \
+            set(instance.thumbnail_source_fields) & set(update_fields):
+        schedule_thumbnails(instance)
+
+
+@receiver(post_save, sender=ProductImage)
+def publish_product_image_progress(sender, instance, created, **kwargs):
+    if not created and instance.tracker.has_changed('bg_removal_status'):
+        transaction.on_commit(lambda: publish_bg_removal_progress(instance))
+
+
+@receiver(post_save, sender=ProductImage)
+def trigger_product_image_thumbnails(sender, instance, created, **kwargs):
+    if created and instance.thumbnails_generated_at:
+        # Reused an already stored image, its thumbnails exist
+        return
+    if created or any(
+            instance.tracker.has_changed(field_name)
+            for field_name in instance.thumbnail_source_fields):
+        schedule_thumbnails(instance)
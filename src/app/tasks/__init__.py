@@ -1,7 +1,12 @@
 __all__ = [
     'send_email', 'send_pepo_email',
     'release_fund_manually', 'create_shipments_in_batch',
-    'hubspot_user_signup', 'send_heart_beat'
+    'hubspot_user_signup', 'send_heart_beat',
+    'rebuild_item_options', 'finish_product_import',
+    'generate_item_thumbnails', 'ingest_uploaded_image',
+    'remove_background_from_product_images',
+    'remove_background_from_product_single_image',
+    'run_background_removal_job',
 ]
 
 from .emails import send_email, send_pepo_email
@@ -9,3 +14,9 @@ from .orders import release_fund_manually, create_shipments_in_batch
 from .hubspot import hubspot_user_signup
 from .kit_automation import send_kits
 from .monitoring import send_heart_beat
+from .catalog import rebuild_item_options, finish_product_import
+from .thumbnails import generate_item_thumbnails
+from .uploads import ingest_uploaded_image
+from .bg_removal import (
+    remove_background_from_product_images,
+    remove_background_from_product_single_image, run_background_removal_job)
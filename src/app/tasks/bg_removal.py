@@ -0,0 +1,148 @@
+from typing import Dict, List
+
+from celery import shared_task
+from django.apps import apps
+from django.conf import settings
+from django.utils.timezone import now
+from PIL import Image
+
+# Consumed by the worker keeping the inference engine resident
+BG_REMOVAL_QUEUE = 'bg_removal'
+
+
+def _open_source(image) -> Image.Image:
+    with image.image_large.open('rb') as file_:
+        source = Image.open(file_)
+        source.load()
+    return source
+
+
+def _failed(image, err: Exception):
+    image.failed_to_remove_background(err)
+    image.save(update_fields=['bg_removal_status', 'bg_removal_details'])
+
+
+def _remove_batch(
+        images: List, statuses: Dict[int, str], raise_exception: bool):
+    from app.utils.bg_removal.compositor import encode_rgba
+    from app.utils.bg_removal.engine import get_engine
+
+    opened, sources = [], []
+    for image in images:
+        image.started_to_remove_background()
+        image.save(update_fields=['bg_removal_status'])
+        try:
+            sources.append(_open_source(image))
+        except Exception as e:
+            _failed(image, e)
+            statuses[image.pk] = image.bg_removal_status
+            if raise_exception:
+                raise
+            continue
+        opened.append(image)
+
+    try:
+        results = get_engine().remove_backgrounds(sources)
+    except Exception as e:
+        for image in opened:
+            _failed(image, e)
+            statuses[image.pk] = image.bg_removal_status
+        if raise_exception:
+            raise
+        return
+
+    for image, result in zip(opened, results):
+        try:
+            content = encode_rgba(result)
+            image.bg_removed_image_large.save(
+                content.name, content, save=False)
+            image.bg_removed_at = now()
+            image.finished_to_remove_background()
+            image.save()
+        except Exception as e:
+            # Back to the stored in_progress, the transition may have run
+            image.refresh_from_db(fields=['bg_removal_status'])
+            _failed(image, e)
+            if raise_exception:
+                raise
+        statuses[image.pk] = image.bg_removal_status
+
+
+def remove_backgrounds(
+        image_pks: List[int], raise_exception: bool = False) -> Dict[int, str]:
+    """
+    Removes the background of several ProductImages, inferred in batches
+    by the engine of this worker. Only one engine batch of full size
+    photos is decoded at a time. Returns the resulting bg_removal_status
+    of each image processed, images that weren't waiting are left out.
+    """
+    from app.models.product import BG_REMOVAL_STATUS
+
+    ProductImageModelRef = apps.get_model('app', 'ProductImage')
+    images = list(ProductImageModelRef.objects.filter(
+        pk__in=image_pks,
+        bg_removal_status__in=[
+            BG_REMOVAL_STATUS.to_do, BG_REMOVAL_STATUS.pending],
+    ).exclude(image_large='').exclude(image_large__isnull=True))
+
+    statuses = {}
+    batch_size = settings.BG_REMOVAL_BATCH_SIZE
+    for start in range(0, len(images), batch_size):
+        _remove_batch(
+            images[start:start + batch_size], statuses, raise_exception)
+    return statuses
+
+
+@shared_task(queue=BG_REMOVAL_QUEUE)
+def remove_background_from_product_images(
+        image_pks: List[int], raise_exception: bool = False) -> List[int]:
+    """ Returns the pks that succeeded """
+    from app.models.product import BG_REMOVAL_STATUS
+
+    statuses = remove_backgrounds(image_pks, raise_exception)
+    return [
+        pk for pk, status in statuses.items()
+        if status == BG_REMOVAL_STATUS.done
+    ]
+
+
+@shared_task(queue=BG_REMOVAL_QUEUE)
+def remove_background_from_product_single_image(
+        image_pk: int, raise_exception: bool = False) -> List[int]:
+    return remove_background_from_product_images([image_pk], raise_exception)
+
+
+@shared_task(queue=BG_REMOVAL_QUEUE)
+def run_background_removal_job(
+        job_pk: int, raise_exception: bool = False) -> Dict[str, str]:
+    """
+    Processes all the images of a BackgroundRemovalJob as one batch and
+    records their outcome on the job.
+    """
+    from app.models.product import BG_REMOVAL_STATUS
+
+    JobModelRef = apps.get_model('app', 'BackgroundRemovalJob')
+    job = JobModelRef.objects.filter(pk=job_pk).first()
+    if job is None:
+        return {}
+    job.started()
+    job.save()
+
+    try:
+        statuses = remove_backgrounds(job.image_ids, raise_exception)
+    except Exception as e:
+        job.failed(e)
+        job.save()
+        raise
+
+    for pk in job.image_ids:
+        # Images that were no longer waiting, or had no image, weren't run
+        job.image_statuses[str(pk)] = statuses.get(pk, job.IMAGE_SKIPPED)
+    outcomes = set(job.image_statuses.values())
+    if BG_REMOVAL_STATUS.failed in outcomes and \
+            BG_REMOVAL_STATUS.done not in outcomes:
+        job.failed(Exception('No background could be removed'))
+    else:
+        job.finished()
+    job.save()
+    return job.image_statuses
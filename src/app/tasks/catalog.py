@@ -0,0 +1,86 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from celery import shared_task
+from django.apps import apps
+from django.conf import settings
+from django.db.models import Q
+
+from app.utils.options import rebuild_option_trees
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def rebuild_item_options():
+    rebuild_option_trees()
+
+
+def _fetch_normalized(url: str):
+    from app.utils.images import fetch_image, normalize_image
+
+    return normalize_image(fetch_image(url)).file
+
+
+@shared_task
+def finish_product_import(product_pks: List[int], image_pks: List[int]) -> int:
+    """
+    The post_save work skipped by bulk_import_products, done once for the
+    whole import: search vectors, fetching the images from their
+    source_url and scheduling their thumbnails. Returns the images stored.
+    """
+    from app.facets import FACET_FIELDS, get_facet_values
+    from app.search import update_search_vectors
+    from app.tasks.thumbnails import generate_item_thumbnails
+    from app.utils.cache import bump_versions, get_product_feed_tags
+
+    ProductModelRef = apps.get_model('app', 'Product')
+    ProductImageModelRef = apps.get_model('app', 'ProductImage')
+
+    update_search_vectors(ProductModelRef.objects.filter(pk__in=product_pks))
+
+    images = list(ProductImageModelRef.objects.filter(
+        Q(image_large='') | Q(image_large__isnull=True),
+        pk__in=image_pks, source_url__isnull=False))
+    if not images:
+        return 0
+
+    stored = []
+    with ThreadPoolExecutor(
+            max_workers=settings.PRODUCT_IMPORT_DOWNLOAD_WORKERS) as executor:
+        # Downloads overlap, Pillow releases the GIL while decoding
+        futures = [
+            executor.submit(_fetch_normalized, image.source_url)
+            for image in images]
+        for image, future in zip(images, futures):
+            try:
+                image.image_large = future.result()
+            except Exception:
+                logger.exception(
+                    'Failed to fetch image %s from %s',
+                    image.pk, image.source_url)
+                continue
+            # Reuses identical stored images in content addressed mode
+            image.set_image_hashes()
+            if not image.image_large._committed:
+                image.image_large.save(
+                    image.image_large.name, image.image_large, save=False)
+            stored.append(image)
+
+    ProductImageModelRef.objects.bulk_update(
+        stored, [
+            'image_large', 'image_hash', 'image_sha256',
+            'thumbnails_generated_at'])
+    for image in stored:
+        if not image.thumbnails_generated_at:
+            generate_item_thumbnails.delay(
+                image._meta.model_name, image.pk)
+
+    products = ProductModelRef.objects.filter(
+        pk__in={image.product_id for image in stored}
+    ).values(*FACET_FIELDS.values())
+    bump_versions([
+        tag for product in products
+        for tag in get_product_feed_tags(get_facet_values(product))])
+    return len(stored)
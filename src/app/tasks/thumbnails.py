@@ -0,0 +1,22 @@
+from celery import shared_task
+
+from django.apps import apps
+from django.utils.timezone import now
+
+from app.utils.thumbnails import generate_thumbnails
+
+
+@shared_task
+def generate_item_thumbnails(model_name: str, pk: int):
+    """
+    Pre-renders the thumbnails of a Product or ProductImage so the read
+    path only ever looks them up.
+    """
+    Model = apps.get_model('app', model_name)
+    instance = Model.objects.filter(pk=pk).first()
+    if instance is None:
+        return 0
+    generated = generate_thumbnails(instance)
+    # update() on purpose, saving would trigger another generation
+    Model.objects.filter(pk=pk).update(thumbnails_generated_at=now())
+    return generated
@@ -0,0 +1,28 @@
+from celery import shared_task
+from django.apps import apps
+
+
+@shared_task
+def ingest_uploaded_image(pk: int) -> bool:
+    """
+    Normalizes and hashes a ProductImage uploaded straight to storage by
+    a presigned POST, which skipped both on the way in. The normalized
+    copy, or an identical stored image in content addressed mode,
+    replaces the uploaded object.
+    """
+    from app.utils.images import normalize_image
+
+    ProductImageModelRef = apps.get_model('app', 'ProductImage')
+    image = ProductImageModelRef.objects.filter(pk=pk).first()
+    if image is None or not image.image_large or image.image_sha256:
+        return False
+
+    uploaded = image.image_large.name
+    storage = image.image_large.storage
+    with image.image_large.open('rb') as file_:
+        image.image_large = normalize_image(file_).file
+    image.thumbnails_generated_at = None
+    # Hashed, and possibly reused, by ProductImage.save
+    image.save()
+    storage.delete(uploaded)
+    return True
@@ -0,0 +1,176 @@
+import io
+import os
+import signal
+import tempfile
+from concurrent.futures.process import BrokenProcessPool
+from unittest import mock
+
+import numpy as np
+import torch
+from django.test import SimpleTestCase
+from django.test.utils import override_settings
+from PIL import Image
+from safetensors.torch import load_file, save_file
+
+from app.management.commands.benchmark_bg_compositing import legacy_compose
+from app.models import ProductImage
+from app.models.product import BG_REMOVAL_STATUS
+from app.tasks.bg_removal import remove_backgrounds
+from app.utils.bg_removal.base import (
+    BG_REMOVAL_MODEL_OPTION, ModelRegistry, load_predictor, map_safetensors)
+from app.utils.bg_removal.compositor import compose_rgba
+from app.utils.bg_removal.engine import BackgroundRemovalEngine
+from base.test import AuthenticatedUserTestBase
+
+
+class ComposeRGBATest(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.photo = rng.integers(0, 256, (30, 40, 3), dtype=np.uint8)
+        self.image = Image.fromarray(self.photo, 'RGB')
+        self.mask = rng.random((30, 40), dtype=np.float32)
+
+    def test_hard_alpha_matches_legacy_threshold(self):
+        mask_image = Image.fromarray(
+            (self.mask * 255).astype(np.uint8)).convert('RGB')
+        legacy = np.asarray(Image.open(io.BytesIO(
+            legacy_compose(self.photo, mask_image))).convert('RGBA'))
+
+        composed = np.asarray(compose_rgba(self.image, self.mask, soft=False))
+
+        np.testing.assert_array_equal(composed, legacy)
+
+    def test_soft_alpha_keeps_probabilities(self):
+        composed = np.asarray(compose_rgba(self.image, self.mask, soft=True))
+
+        np.testing.assert_array_equal(composed[..., :3], self.photo)
+        np.testing.assert_array_equal(
+            composed[..., 3], (self.mask * 255).astype(np.uint8))
+
+
+def predict_first_channel(batch):
+    return batch[:, 0]
+
+
+class BackgroundRemovalEngineTest(SimpleTestCase):
+    def setUp(self):
+        # Forked workers inherit the patch, no model is loaded
+        patcher = mock.patch(
+            'app.utils.bg_removal.base.registry.get_predictor',
+            return_value=predict_first_channel)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.engine = BackgroundRemovalEngine(
+            model_name='u2netp', backend='torch', quantized=False,
+            workers=1, batch_size=2, threads=1)
+        self.addCleanup(self.engine.shutdown)
+        self.images = [Image.new('RGB', (16, 16), 'red') for _ in range(3)]
+
+    def test_recovers_from_a_dead_worker(self):
+        self.assertEqual(len(self.engine.predict_masks(self.images)), 3)
+
+        for process in list(self.engine._executor._processes.values()):
+            os.kill(process.pid, signal.SIGKILL)
+            process.join()
+
+        with self.assertRaises(BrokenProcessPool):
+            self.engine.predict_masks(self.images)
+        masks = self.engine.predict_masks(self.images)
+        self.assertEqual(len(masks), 3)
+        self.assertEqual(masks[0].shape, (320, 320))
+
+
+class LoadPredictorTest(SimpleTestCase):
+    def setUp(self):
+        torch.manual_seed(0)
+        self.net = BG_REMOVAL_MODEL_OPTION.get_model('u2netp')
+        self.net.eval()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.file_name = os.path.join(directory.name, 'u2netp.safetensors')
+        save_file(self.net.state_dict(), self.file_name)
+        patcher = mock.patch(
+            'app.utils.bg_removal.base.download_model',
+            return_value=self.file_name)
+        self.download_model = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_torch_backend_predicts_like_the_model(self):
+        batch = np.random.default_rng(0).standard_normal(
+            (2, 3, 64, 64), dtype=np.float32)
+
+        prediction = load_predictor('u2netp', threads=1)(batch)
+
+        with torch.inference_mode():
+            expected = self.net(torch.from_numpy(batch))[0][:, 0].numpy()
+        self.assertEqual(prediction.shape, (2, 64, 64))
+        np.testing.assert_allclose(prediction, expected, rtol=1e-5, atol=1e-6)
+
+    def test_registry_loads_each_model_once(self):
+        registry = ModelRegistry()
+
+        predictor = registry.get_predictor('u2netp')
+
+        self.assertIs(registry.get_predictor('u2netp'), predictor)
+        self.assertEqual(registry.loaded(), [('u2netp', 'torch', False)])
+        self.download_model.assert_called_once_with('u2netp')
+
+
+class MapSafetensorsTest(SimpleTestCase):
+    def test_maps_the_tensors_load_file_reads(self):
+        torch.manual_seed(0)
+        state_dict = dict(
+            BG_REMOVAL_MODEL_OPTION.get_model('u2netp').state_dict(),
+            half=torch.randn(3, 5).half(),
+            flags=torch.tensor([True, False, True]),
+            odd=torch.arange(7, dtype=torch.uint8))
+        with tempfile.TemporaryDirectory() as directory:
+            file_name = os.path.join(directory, 'u2netp.safetensors')
+            save_file(state_dict, file_name, metadata={'format': 'pt'})
+
+            mapped = map_safetensors(file_name)
+            loaded = load_file(file_name)
+
+            self.assertEqual(set(mapped), set(loaded))
+            for name, tensor in loaded.items():
+                with self.subTest(name=name):
+                    self.assertEqual(mapped[name].dtype, tensor.dtype)
+                    self.assertEqual(mapped[name].shape, tensor.shape)
+                    self.assertTrue(torch.equal(mapped[name], tensor))
+
+
+@override_settings(BG_REMOVAL_BATCH_SIZE=2)
+class RemoveBackgroundsTest(AuthenticatedUserTestBase):
+    def setUp(self):
+        super().setUp()
+        self.images = ProductImage.objects.bulk_create([
+            ProductImage(
+                created_by=self.user, image_large=f'listings/{i}.png',
+                bg_removal_status=BG_REMOVAL_STATUS.pending)
+            for i in range(5)])
+
+    @mock.patch('app.tasks.bg_removal._open_source')
+    @mock.patch('app.utils.bg_removal.engine.get_engine')
+    def test_decodes_one_engine_batch_at_a_time(self, get_engine, open_source):
+        decoded = []
+
+        def open_image(image):
+            decoded.append(image.pk)
+            return Image.new('RGB', (8, 8))
+
+        def infer(sources):
+            # The images opened since the previous batch ran
+            batches.append(list(decoded))
+            decoded.clear()
+            raise RuntimeError('out of memory')
+
+        batches = []
+        open_source.side_effect = open_image
+        get_engine.return_value.remove_backgrounds.side_effect = infer
+
+        statuses = remove_backgrounds([image.pk for image in self.images])
+
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 1])
+        self.assertEqual(
+            statuses, {
+                image.pk: BG_REMOVAL_STATUS.failed for image in self.images})
@@ -0,0 +1,146 @@
+import json
+import queue
+from collections import defaultdict
+from unittest import mock
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from rest_framework import status
+
+from app.models import ProductImage
+from app.models.product import BG_REMOVAL_STATUS
+from base.test import AuthenticatedUserTestBase
+
+
+class InMemoryPubSub:
+    def __init__(self, server):
+        self.server = server
+        self.messages = queue.Queue()
+
+    def subscribe(self, *channels):
+        for channel in channels:
+            self.server.subscribers[channel].append(self.messages)
+
+    def get_message(self, timeout=0.0):
+        try:
+            return self.messages.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        for subscribers in self.server.subscribers.values():
+            if self.messages in subscribers:
+                subscribers.remove(self.messages)
+
+
+class InMemoryRedis:
+    """ The publish/subscribe part of a Redis connection """
+
+    def __init__(self):
+        self.subscribers = defaultdict(list)
+
+    def publish(self, channel, data):
+        for messages in self.subscribers[channel]:
+            messages.put({'type': 'message', 'channel': channel, 'data': data})
+        return len(self.subscribers[channel])
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        return InMemoryPubSub(self)
+
+
+def parse_event(chunk):
+    fields = dict(
+        line.split(': ', 1) for line in chunk.decode().strip().split('\n'))
+    return fields['event'], json.loads(fields['data'])
+
+
+class ProgressStreamTest(AuthenticatedUserTestBase):
+    def setUp(self):
+        super().setUp()
+        self.redis = InMemoryRedis()
+        patcher = mock.patch(
+            'app.utils.progress._get_connection', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.image = ProductImage.objects.create(
+            created_by=self.user, bg_removal_status=BG_REMOVAL_STATUS.pending)
+
+    def stream(self, ids):
+        return self.client.get(
+            reverse('app:product-image-progress-stream'), {'ids': ids})
+
+    def test_streams_published_status_changes(self):
+        response = self.stream(str(self.image.pk))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = iter(response.streaming_content)
+
+        self.assertEqual(next(events), b'retry: 2000\n\n')
+        event, data = parse_event(next(events))
+        self.assertEqual(event, 'progress')
+        self.assertEqual(data['id'], self.image.pk)
+        self.assertEqual(data['status'], BG_REMOVAL_STATUS.pending)
+
+        # Published by the post_save receiver once the worker commits
+        with self.captureOnCommitCallbacks(execute=True):
+            self.image.started_to_remove_background()
+            self.image.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.image.finished_to_remove_background()
+            self.image.save()
+
+        statuses = [parse_event(chunk)[1]['status'] for chunk in events]
+        self.assertEqual(
+            statuses,
+            [BG_REMOVAL_STATUS.in_progress, BG_REMOVAL_STATUS.done])
+
+    def test_ignores_other_users_images(self):
+        other = ProductImage.objects.create(
+            bg_removal_status=BG_REMOVAL_STATUS.pending)
+        response = self.stream(str(other.pk))
+        self.assertEqual(list(response.streaming_content), [b'retry: 2000\n\n'])
+
+    def test_rejects_malformed_ids(self):
+        response = self.stream('1,abc')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_reads_all_statuses_with_one_query(self):
+        images = ProductImage.objects.bulk_create([
+            ProductImage(
+                created_by=self.user, bg_removal_status=BG_REMOVAL_STATUS.done)
+            for _ in range(3)])
+        response = self.stream(','.join(str(image.pk) for image in images))
+
+        with CaptureQueriesContext(connection) as context:
+            chunks = list(response.streaming_content)
+
+        self.assertEqual(len(chunks), 4)
+        self.assertEqual(len(context.captured_queries), 1)
+
+    @override_settings(BG_REMOVAL_PROGRESS_MAX_IMAGES=2)
+    def test_rejects_too_many_ids(self):
+        response = self.stream('1,2,3')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @mock.patch('app.models.product.run_background_removal_job')
+    def test_streams_pending_status_of_queued_jobs(self, task):
+        image = ProductImage.objects.create(
+            created_by=self.user, image_large='listings/photo.png',
+            bg_removal_status=BG_REMOVAL_STATUS.to_do)
+        events = iter(self.stream(str(image.pk)).streaming_content)
+        next(events)
+        self.assertEqual(
+            parse_event(next(events))[1]['status'], BG_REMOVAL_STATUS.to_do)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('app:product-image-bg-removal-job'),
+                {'images': [image.pk]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        task.apply_async.assert_called_once()
+
+        event, data = parse_event(next(events))
+        self.assertEqual(
+            (data['id'], data['status']),
+            (image.pk, BG_REMOVAL_STATUS.pending))
@@ -0,0 +1,139 @@
+from unittest import mock
+
+import boto3
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from moto import mock_aws
+from rest_framework import status
+from storages.backends.s3boto3 import S3Boto3Storage
+
+from app.models import Product, ProductImage
+from app.utils.base import generate_photo_file
+from base.test import AuthenticatedUserTestBase
+
+
+User = get_user_model()
+
+BUCKET = 'test-bucket'
+
+
+class PresignedUploadTest(AuthenticatedUserTestBase):
+    def setUp(self):
+        super().setUp()
+        aws = mock_aws()
+        aws.start()
+        self.addCleanup(aws.stop)
+
+        self.client_s3 = boto3.client(
+            's3', region_name='us-east-1',
+            aws_access_key_id='testing', aws_secret_access_key='testing')
+        self.client_s3.create_bucket(Bucket=BUCKET)
+        self.storage = S3Boto3Storage(
+            bucket_name=BUCKET, region_name='us-east-1',
+            access_key='testing', secret_key='testing')
+        self.patch_storage()
+
+    def patch_storage(self):
+        patcher = mock.patch(
+            'app.services.uploads.get_upload_storage',
+            return_value=self.storage)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def presign(self, content_type='image/jpeg'):
+        response = self.client.post(
+            reverse('app:product-image-presign'),
+            {'filename': 'photo.jpg', 'content_type': content_type})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data
+
+    def upload(self, key, content_type='image/png', body=None):
+        if body is None:
+            body = generate_photo_file(image_type='png').read()
+        self.client_s3.put_object(
+            Bucket=BUCKET, Key=key, Body=body, ContentType=content_type)
+
+    def confirm(self, token, **data):
+        return self.client.post(
+            reverse('app:product-image-confirm'), {'token': token, **data})
+
+    def test_presign_returns_post_for_bundles_key(self):
+        upload = self.presign()
+        self.assertTrue(upload['key'].startswith('bundles/'))
+        self.assertTrue(upload['key'].endswith('.jpg'))
+        self.assertIn(BUCKET, upload['url'])
+        self.assertEqual(upload['fields']['key'], upload['key'])
+        self.assertEqual(upload['fields']['Content-Type'], 'image/jpeg')
+        self.assertIn('policy', upload['fields'])
+
+    def test_presign_rejects_non_image_content_type(self):
+        response = self.client.post(
+            reverse('app:product-image-presign'),
+            {'filename': 'notes.txt', 'content_type': 'text/plain'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_confirm_attaches_uploaded_key(self):
+        product = Product.objects.create(title='Onesie', created_by=self.user)
+        upload = self.presign()
+        self.upload(upload['key'])
+
+        response = self.confirm(upload['token'], product=product.pk)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        image = ProductImage.objects.get(pk=response.data['id'])
+        self.assertEqual(image.image_large.name, upload['key'])
+        self.assertEqual(image.product, product)
+        self.assertEqual(image.created_by, self.user)
+
+    def test_confirm_requires_uploaded_object(self):
+        upload = self.presign()
+        response = self.confirm(upload['token'])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(ProductImage.objects.exists())
+
+    def test_confirm_rejects_non_image_bytes(self):
+        upload = self.presign()
+        # The Content-Type is the client's, the bytes are what counts
+        self.upload(
+            upload['key'], content_type='image/jpeg',
+            body=b'<html><script></script></html>')
+        response = self.confirm(upload['token'])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(ProductImage.objects.exists())
+
+    def test_confirm_rejects_replayed_token(self):
+        upload = self.presign()
+        self.upload(upload['key'])
+
+        first = self.confirm(upload['token'])
+        second = self.confirm(upload['token'])
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(ProductImage.objects.count(), 1)
+
+    def test_confirm_rejects_other_users_token(self):
+        upload = self.presign()
+        self.upload(upload['key'])
+        other = User.objects.create(email='other@example.com', is_active=True)
+        self.client.force_authenticate(other)
+
+        response = self.confirm(upload['token'])
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_confirm_rejects_tampered_token(self):
+        upload = self.presign()
+        self.upload(upload['key'])
+        response = self.confirm(upload['token'] + 'x')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_confirm_rejects_other_users_product(self):
+        owner = User.objects.create(email='owner@example.com', is_active=True)
+        product = Product.objects.create(title='Onesie', created_by=owner)
+        upload = self.presign()
+        self.upload(upload['key'])
+
+        response = self.confirm(upload['token'], product=product.pk)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
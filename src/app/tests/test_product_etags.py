@@ -0,0 +1,88 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+from rest_framework import status
+
+from app.models import Product, ProductBrand, ProductImage
+from app.utils.cache import (
+    EPOCH_KEY, VERSION_KEY_PREFIX, bump_versions, get_versions)
+from base.test import AuthenticatedUserTestBase
+
+
+# Versions have to persist between requests for ETags to match
+LOCMEM_CACHES = {"default": {
+    "BACKEND": "django.core.cache.backends.locmem.LocMemCache"
+}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class VersionsTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_reading_unknown_tags_writes_no_keys(self):
+        tags = [f'feed:brand:{value}' for value in range(50)]
+
+        versions = get_versions(tags)
+
+        self.assertEqual(len(set(versions.values())), 1)
+        self.assertFalse(cache.get_many(
+            [f'{VERSION_KEY_PREFIX}{tag}' for tag in tags]))
+        self.assertEqual(cache.get(EPOCH_KEY), versions[tags[0]])
+
+    def test_bump_moves_away_from_epoch(self):
+        before = get_versions(['options'])
+        bump_versions(['options'])
+        self.assertNotEqual(get_versions(['options']), before)
+
+    def test_flush_changes_unbumped_versions(self):
+        before = get_versions(['options'])
+        cache.clear()
+        with mock.patch(
+                'app.utils.cache._initial_version',
+                return_value=before['options'] + 1):
+            self.assertNotEqual(get_versions(['options']), before)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ProductDetailETagTest(AuthenticatedUserTestBase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.brand = ProductBrand.objects.create(name='Carter')
+        self.product = Product.objects.create(
+            title='Onesie', brand=self.brand, created_by=self.user)
+        self.url = reverse('app:product-detail', args=[self.product.pk])
+
+    def get(self, etag=None):
+        headers = {} if etag is None else {'HTTP_IF_NONE_MATCH': etag}
+        return self.client.get(self.url, **headers)
+
+    def get_etag(self):
+        response = self.get()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        self.assertEqual(
+            self.get(etag).status_code, status.HTTP_304_NOT_MODIFIED)
+        return etag
+
+    def test_image_changes_invalidate_etag(self):
+        etag = self.get_etag()
+        ProductImage.objects.create(product=self.product)
+        self.assertEqual(self.get(etag).status_code, status.HTTP_200_OK)
+
+        etag = self.get_etag()
+        self.product.images.get().delete()
+        self.assertEqual(self.get(etag).status_code, status.HTTP_200_OK)
+
+    def test_brand_rename_invalidates_etag(self):
+        etag = self.get_etag()
+        self.brand.name = 'Carter\'s'
+        self.brand.save()
+
+        response = self.get(etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['brand'], 'Carter\'s')
@@ -0,0 +1,45 @@
+from unittest import mock
+
+from app.models import Product, ProductBrand, ProductFacetCount
+from app.utils.cache import get_facet_tag
+from base.test import AuthenticatedUserTestBase
+
+
+class ProductFacetCountTest(AuthenticatedUserTestBase):
+    def setUp(self):
+        super().setUp()
+        self.brands = [
+            ProductBrand.objects.create(name=name)
+            for name in ('Carter', 'Gap', 'Zara')]
+        product = Product.objects.create(
+            title='Onesie', brand=self.brands[0], created_by=self.user)
+        self.product = Product.objects.get(pk=product.pk)
+
+    def get_brand_counts(self):
+        counts = dict(ProductFacetCount.objects.filter(
+            facet='brand').values_list('value', 'count'))
+        return [counts.get(str(brand.pk), 0) for brand in self.brands]
+
+    def change_brand(self, brand):
+        self.product.brand = brand
+        with mock.patch('app.signals.bump_versions') as bump_versions:
+            self.product.save()
+        return {
+            tag for call in bump_versions.call_args_list for tag in call[0][0]}
+
+    def test_brand_changes_move_counts_from_the_previous_brand(self):
+        first, second, third = self.brands
+        self.assertEqual(self.get_brand_counts(), [1, 0, 0])
+
+        tags = self.change_brand(second)
+        self.assertEqual(self.get_brand_counts(), [0, 1, 0])
+        self.assertTrue({
+            get_facet_tag('brand', first.pk),
+            get_facet_tag('brand', second.pk)} <= tags)
+
+        tags = self.change_brand(third)
+        self.assertEqual(self.get_brand_counts(), [0, 0, 1])
+        self.assertTrue({
+            get_facet_tag('brand', second.pk),
+            get_facet_tag('brand', third.pk)} <= tags)
+        self.assertNotIn(get_facet_tag('brand', first.pk), tags)
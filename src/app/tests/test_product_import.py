@@ -0,0 +1,215 @@
+import io
+import json
+import socket
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import SimpleTestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.exceptions import ParseError
+
+from app.models import (
+    Product, ProductBrand, ProductCategory, ProductFacetCount, ProductSize)
+from app.parsers import CSVParser, JSONLinesParser
+from app.utils.images import UnsafeImageURL, fetch_image
+from base.test import AuthenticatedUserTestBase
+
+
+User = get_user_model()
+
+
+def resolve_to(address):
+    return mock.patch(
+        'app.utils.images.socket.getaddrinfo',
+        return_value=[(
+            socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP, '',
+            (address, 80))])
+
+
+class FetchImageTest(SimpleTestCase):
+    @mock.patch('app.utils.images.requests.get')
+    def test_rejects_internal_urls(self, get):
+        for url in (
+                'http://169.254.169.254/latest/meta-data/',
+                'http://127.0.0.1/photo.jpg',
+                'http://localhost:8000/photo.jpg',
+                'http://[::1]/photo.jpg',
+                'file:///etc/passwd',
+                'ftp://example.com/photo.jpg'):
+            with self.subTest(url=url):
+                with self.assertRaises(UnsafeImageURL):
+                    fetch_image(url)
+        get.assert_not_called()
+
+    @mock.patch('app.utils.images.requests.get')
+    def test_rejects_hosts_resolving_to_private_addresses(self, get):
+        with resolve_to('10.0.0.5'):
+            with self.assertRaises(UnsafeImageURL):
+                fetch_image('http://images.example.com/photo.jpg')
+        get.assert_not_called()
+
+    @mock.patch('app.utils.images.requests.get')
+    def test_rejects_redirect_to_internal_url(self, get):
+        get.return_value = mock.Mock(
+            is_redirect=True,
+            headers={'Location': 'http://169.254.169.254/latest/meta-data/'})
+        with resolve_to('93.184.216.34'):
+            with self.assertRaises(UnsafeImageURL):
+                fetch_image('http://images.example.com/photo.jpg')
+        get.assert_called_once()
+        self.assertFalse(get.call_args.kwargs['allow_redirects'])
+
+    @override_settings(PRODUCT_IMPORT_IMAGE_HOSTS=['cdn.example.com'])
+    @mock.patch('app.utils.images.requests.get')
+    def test_rejects_hosts_outside_allowlist(self, get):
+        with resolve_to('93.184.216.34'):
+            with self.assertRaises(UnsafeImageURL):
+                fetch_image('http://images.example.org/photo.jpg')
+        get.assert_not_called()
+
+
+class ProductImportParserTest(SimpleTestCase):
+    def test_csv_rows_leave_out_empty_cells(self):
+        rows = CSVParser().parse(io.BytesIO(
+            b'id,title,brand,image_urls\r\n'
+            b',Striped onesie,4,http://a.example.com/1.jpg|'
+            b'http://a.example.com/2.jpg\r\n'
+            b'7,,,\r\n'))
+        self.assertEqual(rows, [
+            {'title': 'Striped onesie', 'brand': '4',
+             'image_urls': 'http://a.example.com/1.jpg|'
+                           'http://a.example.com/2.jpg'},
+            {'id': '7'},
+        ])
+
+    def test_csv_rejects_invalid_text(self):
+        with self.assertRaises(ParseError):
+            CSVParser().parse(io.BytesIO(b'title\r\n\xff\xfe\r\n'))
+
+    def test_json_lines_skip_blank_lines(self):
+        rows = JSONLinesParser().parse(io.BytesIO(
+            b'{"title": "Striped onesie"}\n\n{"id": 7, "gender": "boy"}\n'))
+        self.assertEqual(rows, [
+            {'title': 'Striped onesie'}, {'id': 7, 'gender': 'boy'}])
+
+    def test_json_lines_reject_invalid_lines(self):
+        for body in (b'{"title": "Onesie"}\n{"title": \n', b'[1, 2]\n'):
+            with self.subTest(body=body):
+                with self.assertRaisesRegex(ParseError, 'line'):
+                    JSONLinesParser().parse(io.BytesIO(body))
+
+
+@mock.patch('app.services.listing.finish_product_import')
+class ProductImportTest(AuthenticatedUserTestBase):
+    def setUp(self):
+        super().setUp()
+        self.brand = ProductBrand.objects.create(name='Carter')
+        self.category = ProductCategory.objects.create(name='Tops')
+        self.size = ProductSize.objects.create(name='0-3M')
+
+    def _import(self, rows, **kwargs):
+        return self.client.post(
+            reverse('app:product-import'), rows, format='json', **kwargs)
+
+    def _row(self, i, **fields):
+        return {
+            'title': f'Product {i}', 'gender': 'boy', 'quality': 'nwt',
+            'brand': self.brand.pk, 'category': self.category.pk,
+            'size': self.size.pk,
+            'image_urls': [f'http://images.example.com/{i}.jpg'],
+            **fields,
+        }
+
+    def test_imports_csv(self, finish_product_import):
+        response = self.client.post(
+            reverse('app:product-import'),
+            'title,gender,brand,image_urls\r\n'
+            f'Striped onesie,girl,{self.brand.pk},'
+            'http://images.example.com/1.jpg|'
+            'http://images.example.com/2.jpg\r\n',
+            content_type='text/csv')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        product = Product.objects.get(pk=response.data['ids'][0])
+        self.assertEqual(
+            (product.title, product.gender, product.brand_id,
+             product.created_by_id),
+            ('Striped onesie', 'girl', self.brand.pk, self.user.pk))
+        self.assertEqual(
+            sorted(product.images.values_list('source_url', flat=True)),
+            ['http://images.example.com/1.jpg',
+             'http://images.example.com/2.jpg'])
+
+    def test_imports_json_lines(self, finish_product_import):
+        response = self.client.post(
+            reverse('app:product-import'),
+            '\n'.join(json.dumps(self._row(i)) for i in range(2)),
+            content_type='application/x-ndjson')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            list(Product.objects.filter(
+                pk__in=response.data['ids']).order_by('pk').values_list(
+                'title', flat=True)),
+            ['Product 0', 'Product 1'])
+
+    def test_rejects_foreign_and_duplicate_ids(self, finish_product_import):
+        own = Product.objects.create(title='Own', created_by=self.user)
+        other = Product.objects.create(
+            title='Other',
+            created_by=User.objects.create(email='other@example.com'))
+
+        response = self._import([
+            {'id': own.pk, 'title': 'Renamed'},
+            {'id': other.pk, 'title': 'Taken over'},
+            {'id': own.pk, 'title': 'Renamed twice'},
+            self._row(3, brand=self.brand.pk + 1000),
+        ])
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        errors = response.data['rows']
+        self.assertEqual(errors[0], {})
+        self.assertIn('id', errors[1])
+        self.assertIn('id', errors[2])
+        self.assertEqual(list(errors[3]), ['brand'])
+        self.assertEqual(
+            list(Product.objects.order_by('pk').values_list(
+                'title', flat=True)),
+            ['Own', 'Other'])
+        finish_product_import.delay.assert_not_called()
+
+    def _count_import_queries(self, size: int) -> int:
+        with CaptureQueriesContext(connection) as context:
+            response = self._import([self._row(i) for i in range(size)])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data['ids']), size)
+        return len(context.captured_queries)
+
+    def test_import_query_count_is_constant(self, finish_product_import):
+        self.assertEqual(
+            self._count_import_queries(2), self._count_import_queries(20))
+
+    def test_updates_facet_counts_by_delta(self, finish_product_import):
+        other_brand = ProductBrand.objects.create(name='Gap')
+        product = Product.objects.create(
+            title='Own', created_by=self.user, brand=self.brand)
+        ProductFacetCount.objects.all().delete()
+        ProductFacetCount.objects.create(
+            facet='brand', value=str(self.brand.pk), count=5)
+
+        response = self._import([
+            {'id': product.pk, 'brand': other_brand.pk},
+            self._row(1),
+            self._row(2),
+        ])
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        counts = dict(ProductFacetCount.objects.filter(
+            facet='brand').values_list('value', 'count'))
+        self.assertEqual(counts, {
+            str(self.brand.pk): 5 - 1 + 2,
+            str(other_brand.pk): 1,
+        })
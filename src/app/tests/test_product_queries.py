@@ -0,0 +1,113 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+
+from app.models import (
+    Product, ProductImage, ProductBrand, ProductCategory, ProductSize
+)
+from base.test import AuthenticatedUserTestBase
+
+
+User = get_user_model()
+
+
+class ProductListQueryCountTest(AuthenticatedUserTestBase):
+    def setUp(self):
+        super().setUp()
+        brand = ProductBrand.objects.create(name='Carter')
+        category = ProductCategory.objects.create(name='Tops')
+        size = ProductSize.objects.create(name='0-3M')
+        users = [
+            User.objects.create(email=f'buyer{i}@example.com', is_active=True)
+            for i in range(3)
+        ]
+        for i in range(12):
+            product = Product.objects.create(
+                title=f'Product {i}', brand=brand,
+                category=category, size=size)
+            product.favourite.set(users)
+            ProductImage.objects.bulk_create([
+                ProductImage(product=product) for _ in range(2)
+            ])
+
+    def _count_list_queries(self, page_size: int) -> int:
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(
+                reverse('app:product-list'), {'page_size': page_size})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), page_size)
+        return len(context.captured_queries)
+
+    def test_list_query_count_is_constant(self):
+        self.assertEqual(
+            self._count_list_queries(2), self._count_list_queries(12))
+
+
+class ProductSaveQueryTest(AuthenticatedUserTestBase):
+    def setUp(self):
+        super().setUp()
+        product = Product.objects.create(
+            title='Product', gender='neutral', created_by=self.user)
+        self.product = Product.objects.get(pk=product.pk)
+
+    def test_save_updates_changed_fields_without_select(self):
+        self.product.gender = 'boy'
+        with CaptureQueriesContext(connection) as context:
+            self.product.save()
+
+        queries = [
+            query['sql'] for query in context.captured_queries
+            if '"app_product" ' in query['sql']
+        ]
+        self.assertEqual(len(queries), 1)
+        self.assertTrue(queries[0].startswith('UPDATE "app_product" SET'))
+        self.assertIn('"gender"', queries[0])
+        self.assertNotIn('"title"', queries[0])
+        self.assertEqual(
+            Product.objects.values_list('gender', flat=True).get(
+                pk=self.product.pk),
+            'boy')
+
+    def test_save_without_changes_writes_nothing(self):
+        with CaptureQueriesContext(connection) as context:
+            self.product.save()
+
+        self.assertFalse([
+            query for query in context.captured_queries
+            if '"app_product" ' in query['sql']
+        ])
+
+    def _saved_columns(self) -> str:
+        with CaptureQueriesContext(connection) as context:
+            self.product.save()
+        updates = [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith('UPDATE "app_product" SET') and
+            not query['sql'].startswith(
+                'UPDATE "app_product" SET "search_vector"')
+        ]
+        self.assertEqual(len(updates), 1)
+        return updates[0].split(' WHERE ')[0]
+
+    def test_save_tracks_foreign_keys_across_saves(self):
+        first, second = (
+            ProductBrand.objects.create(name=name) for name in ('Carter', 'Gap'))
+
+        self.product.brand = first
+        self.assertIn('"brand_id"', self._saved_columns())
+        self.assertEqual(self.product.tracker.previous('brand_id'), first.pk)
+
+        self.product.brand = second
+        self.product.gender = 'girl'
+        columns = self._saved_columns()
+        self.assertIn('"brand_id"', columns)
+        self.assertIn('"gender"', columns)
+        self.assertEqual(self.product.tracker.previous('brand_id'), second.pk)
+
+        self.product.title = 'Renamed'
+        columns = self._saved_columns()
+        self.assertNotIn('"brand_id"', columns)
+        self.assertNotIn('"gender"', columns)
+        self.assertEqual(self.product.tracker.changed(), {})
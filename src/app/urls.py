@@ -183,6 +183,13 @@ urlpatterns += [
     # re_path(r"^", include(items_router.urls)),
     path('products/<int:pk>/add-favorite/', views.AddFavoriteAPIView.as_view(), name='add-favorite'),
     path('products/<int:pk>/remove-favorite/', views.RemoveFavoriteAPIView.as_view(), name='remove-favorite'),
+    path('products/images/upload', views.ProductImageUploadView.as_view(), name='product-image-upload'),
+    path('products/import', views.ProductImportView.as_view(), name='product-import'),
+    path('products/images/presign', views.ProductImagePresignView.as_view(), name='product-image-presign'),
+    path('products/images/confirm', views.ProductImageConfirmView.as_view(), name='product-image-confirm'),
+    path('products/images/progress/stream', views.ProductImageProgressStreamView.as_view(), name='product-image-progress-stream'),
+    path('products/images/remove-background', views.BackgroundRemovalJobView.as_view(), name='product-image-bg-removal-job'),
+    path('products/images/remove-background/<int:pk>', views.BackgroundRemovalJobDetailView.as_view(), name='product-image-bg-removal-job-detail'),
 
 
 ]
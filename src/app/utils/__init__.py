@@ -1,2 +1,3 @@
 from .serializers import (
-    Base64ImageField, inline_serializer, RecursiveFieldSerializer)
+    Base64ImageField, inline_serializer, RecursiveFieldSerializer,
+    ThumbnailListSerializer, UploadedImageField, with_serializer_query_plan)
@@ -0,0 +1,61 @@
+"""
+Background removal output.
+
+The U2NET probability map is scaled to the photo in float, used as the
+alpha channel, either as is (soft edges) or thresholded at 0.5 like the
+original implementation, and the RGBA image is encoded straight into
+memory as PNG or WebP. Every step is a Pillow or NumPy array op.
+"""
+import io
+from typing import Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image
+
+OUTPUT_EXTENSIONS = {'PNG': 'png', 'WEBP': 'webp'}
+
+
+def resize_mask(mask: np.ndarray, size: Tuple[int, int]) -> np.ndarray:
+    """ The [0, 1] probability map at `size`, as 8 bit alpha """
+    scaled = Image.fromarray(mask.astype(np.float32), 'F').resize(
+        size, Image.BILINEAR)
+    alpha = np.asarray(scaled) * 255
+    return np.clip(alpha, 0, 255, out=alpha).astype(np.uint8)
+
+
+def compose_rgba(
+        image: Image.Image, mask: np.ndarray,
+        soft: Optional[bool] = None) -> Image.Image:
+    """
+    `image` with the mask as alpha. Soft alpha keeps the probabilities,
+    so hair and fabric edges fade out, hard alpha removes pixels below
+    0.5 and paints them white as before.
+    """
+    if soft is None:
+        soft = settings.BG_REMOVAL_SOFT_ALPHA
+    alpha = resize_mask(mask, image.size)
+    rgb = image.convert('RGB')
+    if soft:
+        alpha_image = Image.fromarray(alpha, 'L')
+    else:
+        alpha_image = Image.fromarray(
+            np.where(alpha > 127, 255, 0).astype(np.uint8), 'L')
+        white = Image.new('RGB', image.size, (255, 255, 255))
+        rgb = Image.composite(rgb, white, alpha_image)
+    rgb.putalpha(alpha_image)
+    return rgb
+
+
+def encode_rgba(
+        image: Image.Image, image_format: Optional[str] = None,
+        name: str = 'bg_removed') -> ContentFile:
+    image_format = (image_format or settings.BG_REMOVAL_OUTPUT_FORMAT).upper()
+    options = {}
+    if image_format == 'WEBP':
+        options.update(quality=settings.BG_REMOVAL_WEBP_QUALITY, method=4)
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, **options)
+    return ContentFile(
+        buffer.getvalue(), name=f'{name}.{OUTPUT_EXTENSIONS[image_format]}')
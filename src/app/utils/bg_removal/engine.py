@@ -0,0 +1,131 @@
+"""
+CPU background removal engine.
+
+Images are preprocessed to the fixed 320x320 U2NET input in the calling
+process and sent in batches to a pool of worker processes. Each worker
+loads the model once, when it starts, with the configured backend (torch,
+torchscript or onnxruntime, see `base.load_predictor`), and keeps it for
+its lifetime, so the weights aren't read again for every task. The masks come back as
+normalized U2NET probability maps and are composed into RGBA images by
+`compositor.compose_rgba`.
+
+The pool is created by the first task and lives as long as the Celery
+process, run the `bg_removal` queue on a worker with the solo pool (see
+docker/entrypoint.sh), prefork children can't start processes of their own.
+"""
+import atexit
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Sequence
+
+import numpy as np
+from django.conf import settings
+from PIL import Image
+
+from .compositor import compose_rgba
+
+logger = logging.getLogger(__name__)
+
+MODEL_INPUT_SIZE = 320
+# ToTensorLab(flag=0) normalization
+MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+# Set in each worker process by `_init_worker`
+_predictor = None
+
+
+def _init_worker(model_name: str, backend: str, quantized: bool, threads: int):
+    global _predictor
+    from .base import registry
+
+    _predictor = registry.get_predictor(model_name, backend, quantized, threads)
+
+
+def normalize_prediction(prediction: np.ndarray) -> np.ndarray:
+    """ Min-max scales each saliency map of the batch to [0, 1] """
+    low = prediction.min(axis=(1, 2), keepdims=True)
+    high = prediction.max(axis=(1, 2), keepdims=True)
+    return (prediction - low) / np.maximum(high - low, 1e-8)
+
+
+def _predict(batch: np.ndarray) -> np.ndarray:
+    return normalize_prediction(_predictor(batch))
+
+
+def preprocess(image: Image.Image) -> np.ndarray:
+    """ RescaleT(320) followed by ToTensorLab(flag=0), as one array op """
+    resized = image.convert('RGB').resize(
+        (MODEL_INPUT_SIZE, MODEL_INPUT_SIZE), Image.BILINEAR)
+    array = np.asarray(resized, dtype=np.float32)
+    array /= max(float(array.max()), 1.0)
+    array = (array - MEAN) / STD
+    return array.transpose(2, 0, 1)
+
+
+class BackgroundRemovalEngine:
+    def __init__(
+        self, model_name: Optional[str] = None, backend: Optional[str] = None,
+        quantized: Optional[bool] = None, workers: Optional[int] = None,
+        batch_size: Optional[int] = None, threads: Optional[int] = None
+    ):
+        self.model_name = model_name or settings.BG_REMOVAL_MODEL
+        self.backend = backend or settings.BG_REMOVAL_BACKEND
+        self.quantized = settings.BG_REMOVAL_QUANTIZED \
+            if quantized is None else quantized
+        self.batch_size = batch_size or settings.BG_REMOVAL_BATCH_SIZE
+        self.workers = workers or settings.BG_REMOVAL_WORKERS
+        self.threads = threads or settings.BG_REMOVAL_THREADS
+        self._executor = self._start_executor()
+
+    def _start_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(
+                self.model_name, self.backend, self.quantized, self.threads))
+
+    def predict_masks(self, images: Sequence[Image.Image]) -> List[np.ndarray]:
+        """ One 320x320 probability map per image, in order """
+        if not images:
+            return []
+        inputs = np.stack([preprocess(image) for image in images])
+        batches = [
+            inputs[start:start + self.batch_size]
+            for start in range(0, len(inputs), self.batch_size)
+        ]
+        masks = []
+        try:
+            for batch_masks in self._executor.map(_predict, batches):
+                masks.extend(batch_masks)
+        except BrokenProcessPool:
+            # A worker died (OOM, crash), the pool refuses any further work.
+            # These images fail, the next call gets a fresh pool.
+            logger.exception('Background removal worker died, restarting')
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._start_executor()
+            raise
+        return masks
+
+    def remove_backgrounds(
+            self, images: Sequence[Image.Image]) -> List[Image.Image]:
+        return [
+            compose_rgba(image, mask)
+            for image, mask in zip(images, self.predict_masks(images))
+        ]
+
+    def shutdown(self):
+        self._executor.shutdown()
+
+
+_engine: Optional[BackgroundRemovalEngine] = None
+
+
+def get_engine() -> BackgroundRemovalEngine:
+    """ The engine of this process, started on first use """
+    global _engine
+    if _engine is None:
+        _engine = BackgroundRemovalEngine()
+        atexit.register(_engine.shutdown)
+    return _engine
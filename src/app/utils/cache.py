@@ -0,0 +1,128 @@
+"""
+Versioned cache entries.
+
+Cached values embed the versions of the tags they depend on in their keys,
+bumping a tag makes every dependent entry unreachable, stale entries then
+simply expire. No key scans or pattern deletes are needed.
+"""
+import hashlib
+import time
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+VERSION_KEY_PREFIX = 'version:'
+EPOCH_KEY = 'version:epoch'
+FEED_KEY_PREFIX = 'feed:page:'
+FEED_STATS_KEYS = {'hits': 'feed:stats:hits', 'misses': 'feed:stats:misses'}
+
+# Resources
+OPTIONS_TAG = 'options'
+
+# Product feed tags
+FEED_ALL_TAG = 'feed:all'
+FEED_OPTIONS_TAG = 'feed:options'
+FEED_FACETS = ('gender', 'quality', 'category', 'brand', 'size')
+
+
+def _initial_version() -> int:
+    # Time based, so counters lost on a cache flush never restart at a
+    # version some stale entry was stored under.
+    return int(time.time() * 1000)
+
+
+def get_versions(tags: Iterable[str]) -> Dict[str, int]:
+    """
+    Tags never bumped share the version of the cache epoch, the only key
+    written on read. Tags come from request values, a key per tag would
+    let any request leave keys behind.
+    """
+    keys = {tag: f'{VERSION_KEY_PREFIX}{tag}' for tag in tags}
+    found = cache.get_many([EPOCH_KEY, *keys.values()])
+    epoch = found.get(EPOCH_KEY)
+    if epoch is None:
+        # Recreated after a flush, so ETags handed out before never match
+        epoch = _initial_version()
+        if not cache.add(EPOCH_KEY, epoch, timeout=None):
+            epoch = cache.get(EPOCH_KEY, epoch)
+    return {tag: found.get(key, epoch) for tag, key in keys.items()}
+
+
+def bump_versions(tags: Iterable[str]):
+    for tag in set(tags):
+        key = f'{VERSION_KEY_PREFIX}{tag}'
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Past the epoch the tag was read at until now
+            version = max(_initial_version(), cache.get(EPOCH_KEY, 0) + 1)
+            cache.set(key, version, timeout=None)
+
+
+def normalize_query_params(query_params) -> List:
+    return sorted(
+        (key, sorted(value for value in query_params.getlist(key) if value))
+        for key in query_params.keys()
+    )
+
+
+def get_product_tag(pk) -> str:
+    return f'product:{pk}'
+
+
+def get_facet_tag(facet: str, value) -> str:
+    return f'feed:{facet}:{str(value).lower()}'
+
+
+def get_feed_tags(query_params) -> List[str]:
+    """
+    Tags of a feed page. Pages filtered by facets only depend on products
+    carrying one of the filtered values, every other page on all products.
+    """
+    tags = [
+        get_facet_tag(facet, value)
+        for facet in FEED_FACETS
+        for value in query_params.getlist(facet) if value
+    ]
+    return sorted(tags or [FEED_ALL_TAG]) + [FEED_OPTIONS_TAG]
+
+
+def get_product_feed_tags(facet_values: Iterable) -> List[str]:
+    """
+    Tags to bump when a product with the given (facet, value) pairs changes.
+    """
+    return [FEED_ALL_TAG] + [
+        get_facet_tag(facet, value) for facet, value in facet_values]
+
+
+def get_feed_cache_key(request, *parts) -> str:
+    query = normalize_query_params(request.query_params)
+    versions = get_versions(get_feed_tags(request.query_params))
+    digest = hashlib.sha1(repr(
+        (request.path, query, sorted(versions.items())) + parts
+    ).encode('utf-8')).hexdigest()
+    return f'{FEED_KEY_PREFIX}{digest}'
+
+
+def get_cached_feed(key: str) -> Optional[bytes]:
+    content = cache.get(key)
+    stat = 'misses' if content is None else 'hits'
+    try:
+        cache.incr(FEED_STATS_KEYS[stat])
+    except ValueError:
+        cache.add(FEED_STATS_KEYS[stat], 1, timeout=None)
+    return content
+
+
+def set_cached_feed(key: str, content: bytes):
+    cache.set(key, content, timeout=settings.PRODUCT_FEED_CACHE_TIMEOUT)
+
+
+def get_feed_cache_stats() -> Dict:
+    found = cache.get_many(FEED_STATS_KEYS.values())
+    stats = {
+        name: found.get(key) or 0 for name, key in FEED_STATS_KEYS.items()}
+    total = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = round(stats['hits'] / total, 4) if total else None
+    return stats
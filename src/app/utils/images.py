@@ -0,0 +1,223 @@
+"""
+Single pass image ingest.
+
+Uploaded photos are decoded once (JPEGs with Pillow's draft mode, which
+lets libjpeg decode straight at a 1/2, 1/4 or 1/8 scale), rotated upright
+from their EXIF orientation, downscaled to a maximum edge and encoded once
+without metadata. The background removal source is resized from the same
+decoded image instead of decoding the upload a second time.
+
+Stored images are identified by a perceptual difference hash (dHash) and
+the sha256 of their bytes, see `get_image_hashes`.
+"""
+import hashlib
+import io
+import ipaddress
+import os
+import socket
+import tempfile
+from typing import NamedTuple, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+from uuid import uuid4
+
+import requests
+from django.conf import settings
+from django.core.files import File
+from PIL import Image, ImageOps
+
+# Formats kept as uploaded, anything else (e.g. GIF) is stored as PNG
+KEPT_FORMATS = ('JPEG', 'PNG', 'WEBP')
+FORMAT_EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp'}
+
+
+class ImageHashes(NamedTuple):
+    dhash: int
+    sha256: str
+
+
+class NormalizedImage(NamedTuple):
+    file: File
+    size: Tuple[int, int]
+    bg_removal_source: Optional[str]
+
+
+def get_dhash(image: Image.Image) -> int:
+    """
+    64 bit difference hash: each bit tells whether a pixel of the 9x8
+    grayscale thumbnail is brighter than its right neighbour. Returned
+    signed, to fit a bigint column.
+    """
+    small = image.convert('L').resize((9, 8), Image.LANCZOS)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            value = (value << 1) | (left > pixels[row * 9 + col + 1])
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def get_image_hashes(file_) -> ImageHashes:
+    """
+    Hashes of an image file about to be stored. Files coming out of
+    `normalize_image` carry them already, others are read once in chunks
+    and decoded at the smallest draft scale.
+    """
+    hashes = getattr(file_, 'image_hashes', None)
+    if hashes is not None:
+        return hashes
+
+    sha256 = hashlib.sha256()
+    file_.seek(0)
+    for chunk in file_.chunks():
+        sha256.update(chunk)
+    file_.seek(0)
+    with Image.open(file_) as image:
+        image.draft('L', (64, 64))
+        dhash = get_dhash(image)
+    file_.seek(0)
+    return ImageHashes(dhash, sha256.hexdigest())
+
+
+def get_bg_removal_source_edge() -> int:
+    return max(
+        settings.LISTING_ITEM_IMAGE_RESIZE_DEFAULT_WIDTH,
+        settings.LISTING_ITEM_IMAGE_RESIZE_DEFAULT_HEIGHT)
+
+
+def _fit(size: Tuple[int, int], max_edge: int) -> Tuple[int, int]:
+    width, height = size
+    scale = min(max_edge / max(width, height), 1)
+    return max(round(width * scale), 1), max(round(height * scale), 1)
+
+
+def _encode(image: Image.Image, image_format: str, fp, icc_profile=None):
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    options = {'quality': settings.LISTING_ITEM_IMAGE_QUALITY}
+    if icc_profile:
+        options['icc_profile'] = icc_profile
+    # No exif=, the metadata (GPS, camera, orientation) is dropped
+    image.save(fp, format=image_format, **options)
+
+
+def normalize_image(
+        file_, max_edge: Optional[int] = None,
+        bg_removal_source: bool = False) -> NormalizedImage:
+    """
+    Decodes `file_` once and returns the image to store, upright,
+    at most `max_edge` pixels on its longest side and stripped of metadata,
+    in a temporary file.
+    With `bg_removal_source` a smaller copy for background removal is
+    written to DATA_BG_REMOVAL_SOURCE_PATH as well.
+    """
+    max_edge = max_edge or settings.LISTING_ITEM_IMAGE_MAX_EDGE
+    file_.seek(0)
+    with Image.open(file_) as image:
+        image_format = image.format if image.format in KEPT_FORMATS else 'PNG'
+        icc_profile = image.info.get('icc_profile')
+        if image.format == 'JPEG':
+            # A square box keeps both edges >= max_edge, whatever the rotation
+            image.draft(image.mode, (max_edge, max_edge))
+        image.load()
+        ImageOps.exif_transpose(image, in_place=True)
+        if max(image.size) > max_edge:
+            image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+        name = os.path.splitext(os.path.basename(file_.name or 'image'))[0]
+        name = f'{name}.{FORMAT_EXTENSIONS[image_format]}'
+        # On disk, not in memory, like TemporaryFileUploadHandler uploads
+        output = tempfile.TemporaryFile()
+        _encode(image, image_format, output, icc_profile)
+
+        source_path = None
+        if bg_removal_source:
+            os.makedirs(settings.DATA_BG_REMOVAL_SOURCE_PATH, exist_ok=True)
+            source_path = os.path.join(
+                settings.DATA_BG_REMOVAL_SOURCE_PATH, f'{uuid4()}--{name}')
+            source_size = _fit(image.size, get_bg_removal_source_edge())
+            if source_size == image.size:
+                source = image
+            else:
+                source = image.resize(source_size, Image.LANCZOS)
+            _encode(source, image_format, source_path, icc_profile)
+
+        normalized = File(output, name=name)
+        sha256 = hashlib.sha256()
+        output.seek(0)
+        for chunk in normalized.chunks():
+            sha256.update(chunk)
+        output.seek(0)
+        normalized.image_hashes = ImageHashes(
+            get_dhash(image), sha256.hexdigest())
+        return NormalizedImage(normalized, image.size, source_path)
+
+
+class UnsafeImageURL(ValueError):
+    pass
+
+
+def _is_allowed_host(host: str) -> bool:
+    allowed_hosts = settings.PRODUCT_IMPORT_IMAGE_HOSTS
+    return not allowed_hosts or any(
+        host == allowed or host.endswith(f'.{allowed}')
+        for allowed in allowed_hosts)
+
+
+def check_image_url(url: str):
+    """
+    Raises UnsafeImageURL unless `url` is http(s), on an allowed host and
+    resolves only to public addresses, so imports can't reach the
+    metadata endpoint, localhost or the private network.
+    """
+    parsed = urlparse(url)
+    if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+        raise UnsafeImageURL(f'{url} is not an http(s) URL')
+    host = parsed.hostname.lower().rstrip('.')
+    if not _is_allowed_host(host):
+        raise UnsafeImageURL(f'{host} is not an allowed image host')
+    try:
+        addresses = {
+            info[4][0] for info in socket.getaddrinfo(
+                host, parsed.port or (443 if parsed.scheme == 'https' else 80),
+                proto=socket.IPPROTO_TCP)}
+    except (socket.gaierror, UnicodeError) as e:
+        raise UnsafeImageURL(f'{host} does not resolve - {e}')
+    for address in addresses:
+        # Drops the scope of link-local IPv6 addresses, e.g. fe80::1%eth0
+        ip = ipaddress.ip_address(address.split('%')[0])
+        if not ip.is_global or ip.is_multicast:
+            raise UnsafeImageURL(f'{host} resolves to {ip}')
+
+
+def fetch_image(url: str) -> File:
+    """
+    Downloads the image at `url`, at most PRODUCT_IMAGE_UPLOAD_MAX_SIZE
+    bytes, into memory. Redirects are followed by hand, every URL is
+    checked by `check_image_url`. Raises ValueError for anything larger.
+    """
+    max_size = settings.PRODUCT_IMAGE_UPLOAD_MAX_SIZE
+    for _ in range(settings.PRODUCT_IMPORT_MAX_REDIRECTS + 1):
+        check_image_url(url)
+        response = requests.get(
+            url, stream=True, allow_redirects=False,
+            timeout=settings.PRODUCT_IMPORT_DOWNLOAD_TIMEOUT)
+        if not response.is_redirect:
+            break
+        response.close()
+        url = urljoin(url, response.headers['Location'])
+    else:
+        raise UnsafeImageURL(f'Too many redirects fetching {url}')
+
+    with response:
+        response.raise_for_status()
+        if int(response.headers.get('Content-Length') or 0) > max_size:
+            raise ValueError(f'{url} is larger than {max_size} bytes')
+        buffer = io.BytesIO()
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            buffer.write(chunk)
+            if buffer.tell() > max_size:
+                raise ValueError(f'{url} is larger than {max_size} bytes')
+    buffer.seek(0)
+    name = os.path.basename(urlparse(url).path) or 'image'
+    return File(buffer, name=name)
@@ -0,0 +1,146 @@
+import json
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence
+
+from django.apps import apps
+from django.core.cache import cache
+from django.db import transaction
+from redis.exceptions import LockError
+
+from app.utils.cache import OPTIONS_TAG, bump_versions
+
+# Same keys, in the same order, as the Product*Serializer classes
+OPTION_TREES = (
+    ('sizes', 'ProductSize', ('id', 'name', 'children', 'slug', 'title')),
+    ('categories', 'ProductCategory',
+     ('id', 'name', 'slug', 'title', 'children')),
+    ('brands', 'ProductBrand',
+     ('id', 'name', 'children', 'slug', 'title', 'suggested')),
+)
+
+OPTIONS_CACHE_KEY = 'item_options'
+OPTIONS_STALE_KEY = 'item_options:stale'
+OPTIONS_LOCK_KEY = 'item_options:lock'
+OPTIONS_REBUILD_KEY = 'item_options:rebuild'
+OPTIONS_LOCK_TIMEOUT = 60
+
+
+def build_tree(queryset, fields: Sequence[str]) -> List[Dict]:
+    """
+    Nests an MPTT model with a single query. Rows come in (tree_id, lft)
+    order, so every parent is seen before its children and siblings keep
+    the order the children relation returns them in.
+    """
+    columns = [field for field in fields if field != 'children']
+    rows = queryset.order_by('tree_id', 'lft').values(
+        'parent_id', *columns)
+
+    roots, nodes = [], {}
+    for row in rows:
+        node = {
+            field: [] if field == 'children' else row[field]
+            for field in fields
+        }
+        nodes[row['id']] = node
+        parent = nodes.get(row['parent_id'])
+        if parent is not None:
+            parent['children'].append(node)
+        elif row['parent_id'] is None:
+            roots.append(node)
+    return roots
+
+
+def build_option_trees() -> Dict[str, List[Dict]]:
+    return {
+        name: build_tree(
+            apps.get_model('app', model_name).objects.all(), fields)
+        for name, model_name, fields in OPTION_TREES
+    }
+
+
+def render_option_trees() -> bytes:
+    # Matches the JSONRenderer defaults (compact, unicode)
+    return json.dumps(
+        build_option_trees(), ensure_ascii=False, separators=(',', ':')
+    ).encode('utf-8')
+
+
+@contextmanager
+def _lock(name: str):
+    """
+    Holds `name` while rendering. Backends without locking (locmem, dummy
+    in tests), or a lock not acquired in time, render unguarded rather
+    than failing the request.
+    """
+    if not hasattr(cache, 'lock'):
+        yield False
+        return
+    lock = cache.lock(
+        name, timeout=OPTIONS_LOCK_TIMEOUT,
+        blocking_timeout=OPTIONS_LOCK_TIMEOUT)
+    try:
+        acquired = lock.acquire()
+    except LockError:
+        acquired = False
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            try:
+                lock.release()
+            except LockError:
+                # Expired while rendering, someone else may hold it now
+                pass
+
+
+def rebuild_option_trees() -> bytes:
+    """
+    Rebuilds the cached option trees, one rebuild at a time.
+    The stale flag is cleared before reading, so edits landing during the
+    rebuild flag the new content stale again.
+    """
+    with _lock(OPTIONS_LOCK_KEY):
+        cache.delete(OPTIONS_STALE_KEY)
+        content = render_option_trees()
+        cache.set(OPTIONS_CACHE_KEY, content, timeout=None)
+    cache.delete(OPTIONS_REBUILD_KEY)
+    # ETags handed out while the stale copy was served must not match
+    bump_versions([OPTIONS_TAG])
+    return content
+
+
+def schedule_option_trees_rebuild():
+    """
+    Queues a single background rebuild, further calls are no-ops until
+    it has run.
+    """
+    from app.tasks.catalog import rebuild_item_options
+
+    if cache.add(OPTIONS_REBUILD_KEY, 1, timeout=OPTIONS_LOCK_TIMEOUT):
+        rebuild_item_options.delay()
+
+
+def invalidate_option_trees():
+    # Flag instead of deleting, readers keep the stale copy meanwhile
+    cache.set(OPTIONS_STALE_KEY, 1, timeout=None)
+    transaction.on_commit(schedule_option_trees_rebuild)
+
+
+def get_option_trees() -> bytes:
+    """
+    Serves the cached option trees, stale content included while a
+    background rebuild is pending. A cold cache is rebuilt by the first
+    request only, concurrent ones wait on the lock and reuse its result.
+    """
+    found = cache.get_many([OPTIONS_CACHE_KEY, OPTIONS_STALE_KEY])
+    content: Optional[bytes] = found.get(OPTIONS_CACHE_KEY)
+    if content is None:
+        with _lock(OPTIONS_LOCK_KEY):
+            content = cache.get(OPTIONS_CACHE_KEY)
+            if content is None:
+                cache.delete(OPTIONS_STALE_KEY)
+                content = render_option_trees()
+                cache.set(OPTIONS_CACHE_KEY, content, timeout=None)
+    elif found.get(OPTIONS_STALE_KEY):
+        schedule_option_trees_rebuild()
+    return content
@@ -0,0 +1,105 @@
+"""
+Background removal progress over Redis pub/sub.
+
+Workers publish every ProductImage bg_removal_status change on a per image
+channel. `stream_bg_removal_progress` turns the channels of several images
+into server-sent events, so a client follows a whole upload on one
+connection instead of polling `/progress/<pk>` per image.
+"""
+import json
+import logging
+import time
+from typing import Dict, Iterable, Iterator, Optional
+
+from django.conf import settings
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+BG_REMOVAL_CHANNEL = 'bg_removal:image:{pk}'
+
+
+def get_bg_removal_channel(pk: int) -> str:
+    return BG_REMOVAL_CHANNEL.format(pk=pk)
+
+
+def _get_connection():
+    try:
+        return get_redis_connection('default')
+    except NotImplementedError:
+        # Not a Redis cache (tests), nothing to publish to
+        return None
+
+
+def get_bg_removal_message(image) -> Dict:
+    return {
+        'id': image.pk,
+        'status': image.bg_removal_status,
+        'progress': image.progress,
+    }
+
+
+def publish_bg_removal_progress(*images):
+    connection = _get_connection()
+    if connection is None:
+        return
+    for image in images:
+        try:
+            connection.publish(
+                get_bg_removal_channel(image.pk),
+                json.dumps(get_bg_removal_message(image)))
+        except RedisError:
+            logger.exception(
+                'Failed to publish progress of image %s', image.pk)
+
+
+def format_event(message: Dict) -> str:
+    return (
+        f'id: {message["id"]}:{message["status"]}\n'
+        f'event: progress\n'
+        f'data: {json.dumps(message)}\n\n')
+
+
+def stream_bg_removal_progress(
+        pks: Iterable[int], images: Iterable,
+        finished_statuses: Iterable[str],
+        timeout: Optional[int] = None) -> Iterator[str]:
+    """
+    Server-sent events for `images`, the ones of `pks` the client may see:
+    their current status first, then every change, until all of them are
+    finished or `timeout` seconds passed. The stream holds a request
+    worker, so it is kept short, EventSource reconnects after `retry`
+    and gets the current statuses again.
+    """
+    timeout = timeout or settings.BG_REMOVAL_PROGRESS_STREAM_TIMEOUT
+    finished_statuses = set(finished_statuses)
+    yield 'retry: 2000\n\n'
+
+    connection = _get_connection()
+    pubsub = connection.pubsub(ignore_subscribe_messages=True) \
+        if connection is not None else None
+    try:
+        if pubsub is not None and pks:
+            # Subscribed before reading the statuses, no change is missed
+            pubsub.subscribe(*map(get_bg_removal_channel, pks))
+        pending = set()
+        for image in images:
+            yield format_event(get_bg_removal_message(image))
+            if image.bg_removal_status not in finished_statuses:
+                pending.add(image.pk)
+
+        deadline = time.monotonic() + timeout
+        while pending and pubsub is not None and time.monotonic() < deadline:
+            message = pubsub.get_message(timeout=1.0)
+            if message is None:
+                continue
+            data = json.loads(message['data'])
+            if data['id'] not in pending:
+                continue
+            yield format_event(data)
+            if data['status'] in finished_statuses:
+                pending.discard(data['id'])
+    finally:
+        if pubsub is not None:
+            pubsub.close()
@@ -0,0 +1,80 @@
+"""
+Relevance scoring for the product feed.
+
+Every product keeps a `match_vector`: one bigint token per matchable
+attribute (category, size, brand and gender). A token packs the dimension
+into the high 32 bits and the value id into the low 32 bits, so the vector
+fits in a GIN indexed array and the overlap operator (`&&`) narrows the
+catalog to candidates without a GROUP BY.
+"""
+from functools import reduce
+from operator import add
+from typing import Dict, Iterable, List, Optional
+
+from django.db.models import Case, IntegerField, Value, When
+
+MATCH_DIMENSIONS = ('category', 'size', 'brand', 'gender')
+GENDERS = ('girl', 'boy', 'neutral')
+
+
+def encode_match_token(dimension: str, value) -> Optional[int]:
+    if value in (None, ''):
+        return None
+    if dimension == 'gender':
+        value = str(value).lower()
+        if value not in GENDERS:
+            return None
+        value = GENDERS.index(value)
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return None
+    return ((MATCH_DIMENSIONS.index(dimension) + 1) << 32) | value
+
+
+def get_match_vector(product) -> List[int]:
+    tokens = [
+        encode_match_token('category', product.category_id),
+        encode_match_token('size', product.size_id),
+        encode_match_token('brand', product.brand_id),
+        encode_match_token('gender', product.gender),
+    ]
+    return [token for token in tokens if token is not None]
+
+
+def get_match_tokens(params: Dict[str, Iterable]) -> Dict[str, List[int]]:
+    """
+    Encodes requested filter values, e.g. `{'brand': ['3', '7']}`,
+    into tokens grouped by dimension.
+    """
+    tokens = {}
+    for dimension in MATCH_DIMENSIONS:
+        encoded = {
+            encode_match_token(dimension, value)
+            for value in params.get(dimension) or []
+        }
+        encoded.discard(None)
+        if encoded:
+            tokens[dimension] = sorted(encoded)
+    return tokens
+
+
+def annotate_relevance(queryset, tokens: Dict[str, List[int]]):
+    """
+    Annotates `matched_items` with the number of dimensions whose tokens
+    overlap the product's match vector and keeps only products matching at
+    least one of them.
+    """
+    if not tokens:
+        return queryset.annotate(
+            matched_items=Value(0, output_field=IntegerField()))
+
+    score = reduce(add, [
+        Case(
+            When(match_vector__overlap=dimension_tokens, then=Value(1)),
+            default=Value(0), output_field=IntegerField())
+        for dimension_tokens in tokens.values()
+    ])
+    candidates = sorted({t for ts in tokens.values() for t in ts})
+    return queryset.filter(match_vector__overlap=candidates).annotate(
+        matched_items=score)
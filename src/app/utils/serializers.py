@@ -1,9 +1,18 @@
 import six
+from functools import lru_cache
 from rest_framework import serializers
 import base64
 import imghdr
 from uuid import UUID, uuid4
+from django.core.exceptions import FieldDoesNotExist
 from django.core.files.base import ContentFile
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+from PIL import Image
+
+from app.utils.images import normalize_image
+from app.utils.thumbnails import (
+    collect_related, negotiate_image_format, resolve_thumbnails)
 
 
 def create_serializer_class(name, fields):
@@ -20,6 +29,11 @@ def inline_serializer(*, fields, data=None, **kwargs):
 
 
 class Base64ImageField(serializers.ImageField):
+    def __init__(self, *args, normalize: bool = False, **kwargs):
+        # Product photos are stored upright, downscaled and without metadata
+        self.normalize = normalize
+        super().__init__(*args, **kwargs)
+
     def to_internal_value(self, data):
         # Check if this is a base64 string
         if isinstance(data, six.string_types):
@@ -44,16 +58,46 @@ class Base64ImageField(serializers.ImageField):
 
             data = ContentFile(decoded_file, name=complete_file_name)
 
-        return super(Base64ImageField, self).to_internal_value(data)
+        data = super(Base64ImageField, self).to_internal_value(data)
+        if self.normalize:
+            return normalize_image(data).file
+        return data
 
     def get_file_extension(self, file_name, decoded_file):
-
-        extension = imghdr.what(file_name, decoded_file)
+        # imghdr only needs the signature, don't hand it the whole image
+        extension = imghdr.what(file_name, decoded_file[:32])
         extension = "jpg" if extension == "jpeg" else extension
 
         return extension
 
 
+class UploadedImageField(serializers.FileField):
+    """
+    Image field for multipart uploads that only reads the image header.
+    Unlike `ImageField` it doesn't verify the whole image, so the upload
+    stays a (temporary) file handle that storage can stream from.
+    """
+    default_error_messages = {
+        'invalid_image': _(
+            'Upload a valid image. The file you uploaded was either not an '
+            'image or a corrupted image.'),
+    }
+    allowed_formats = ('JPEG', 'PNG', 'WEBP', 'GIF')
+
+    def to_internal_value(self, data):
+        file_object = super().to_internal_value(data)
+        try:
+            # Lazy, Pillow parses the header and leaves the pixel data
+            with Image.open(file_object) as image:
+                image_format = image.format
+        except (OSError, SyntaxError, Image.DecompressionBombError):
+            self.fail('invalid_image')
+        if image_format not in self.allowed_formats:
+            self.fail('invalid_image')
+        file_object.seek(0)
+        return file_object
+
+
 class DynamicFieldSerializer(serializers.ModelSerializer):
     """
     A ModelSerializer that takes an additional `fields` argument that
@@ -78,9 +122,107 @@ class DynamicFieldSerializer(serializers.ModelSerializer):
                 self.fields.pop(field_name)
 
 
+class ThumbnailListSerializer(serializers.ListSerializer):
+    """
+    Resolves the thumbnails of a whole page in bulk before rendering, in
+    the image format the request asks for.
+    The child serializer lists the (prefetched) relations holding images
+    in `Meta.thumbnail_relations`.
+    """
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.Manager) else data
+        iterable = list(iterable)
+        relations = getattr(self.child.Meta, 'thumbnail_relations', ())
+        resolve_thumbnails(
+            (obj for obj in collect_related(iterable, relations)
+             if hasattr(obj, 'get_thumbnail_sources')),
+            negotiate_image_format(self.context.get('request')))
+        return super().to_representation(iterable)
+
+
 class RecursiveFieldSerializer(serializers.Serializer):
     def to_representation(self, value):
         serializer = self.parent.parent.__class__(
             value,
             context=self.context)
         return serializer.data
+
+
+def get_related_lookups(serializer, model=None, prefix='', many=False):
+    """
+    Walks the serializer tree and collects the relations it reads.
+    Returns a tuple of (select_related, prefetch_related) lookups.
+
+    Forward relations are joined with `select_related`, anything reached
+    through a reverse or many-to-many relation is prefetched instead.
+    """
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+    if model is None:
+        model = getattr(getattr(serializer, 'Meta', None), 'model', None)
+
+    select_related, prefetch_related = set(), set()
+    if model is None:
+        return select_related, prefetch_related
+
+    for field in serializer.fields.values():
+        if field.write_only or field.source == '*':
+            continue
+        # pk-only related fields read `<name>_id` from the row itself.
+        if isinstance(field, serializers.RelatedField) and \
+                field.use_pk_only_optimization():
+            continue
+
+        current_model, path, is_many = model, [], many
+        for attr in field.source_attrs:
+            try:
+                model_field = current_model._meta.get_field(attr)
+            except FieldDoesNotExist:
+                break
+            if not model_field.is_relation or \
+                    model_field.related_model is None:
+                break
+            path.append(attr)
+            is_many = is_many or model_field.many_to_many or \
+                model_field.one_to_many
+            current_model = model_field.related_model
+
+        if not path:
+            continue
+
+        lookup = prefix + '__'.join(path)
+        if is_many:
+            prefetch_related.add(lookup)
+        else:
+            select_related.add(lookup)
+
+        if isinstance(field, serializers.BaseSerializer) and \
+                len(path) == len(field.source_attrs):
+            nested_select, nested_prefetch = get_related_lookups(
+                field, current_model, f'{lookup}__', is_many)
+            select_related |= nested_select
+            prefetch_related |= nested_prefetch
+
+    return select_related, prefetch_related
+
+
+@lru_cache(maxsize=None)
+def get_serializer_query_plan(serializer_class):
+    select_related, prefetch_related = get_related_lookups(
+        serializer_class())
+    return tuple(sorted(select_related)), tuple(sorted(prefetch_related))
+
+
+def with_serializer_query_plan(queryset, serializer_class):
+    """
+    Applies the select/prefetch plan of `serializer_class` to `queryset`,
+    so serializing a page costs a constant number of queries.
+    """
+    select_related, prefetch_related = get_serializer_query_plan(
+        serializer_class)
+    if select_related:
+        queryset = queryset.select_related(*select_related)
+    if prefetch_related:
+        queryset = queryset.prefetch_related(*prefetch_related)
+    return queryset
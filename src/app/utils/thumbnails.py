@@ -0,0 +1,197 @@
+"""
+Batched thumbnail URL resolution.
+
+Models expose their thumbnails through `get_thumbnail_sources()`, a
+mapping of property name to (source file, geometry). `resolve_thumbnails`
+computes every thumbnail name up front and looks them all up in the sorl
+key value store with one cache multi-get (plus one query for cache misses)
+instead of a `get_thumbnail` call per image. Only thumbnails missing from
+the store go through `get_thumbnail` and get rendered.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from PIL import Image
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+
+THUMBNAIL_OPTIONS = {'crop': 'center', 'quality': 99}
+
+# `?image_format=webp` asks list endpoints for thumbnail variants
+IMAGE_FORMAT_PARAM = 'image_format'
+# Smallest first, a client able to decode one can decode the next ones
+VARIANT_FORMATS = ('AVIF', 'WEBP')
+
+ThumbnailSource = Tuple[Optional[object], str]
+
+
+class ThumbnailMixin:
+    # Image fields thumbnails are pre-rendered for
+    thumbnail_source_fields: Tuple[str, ...] = ()
+
+    def get_thumbnail_sources(self) -> Dict[str, ThumbnailSource]:
+        # Overridden by models serving thumbnails, none by default
+        return {}
+
+    def get_thumbnail_url(self, name: str) -> Optional[str]:
+        resolved = getattr(self, '_resolved_thumbnails', None)
+        if resolved is not None and name in resolved:
+            return resolved[name]
+        file_, geometry = self.get_thumbnail_sources()[name]
+        if not file_:
+            return None
+        return get_thumbnail(file_, geometry, **get_thumbnail_options()).url
+
+
+def get_variant_formats() -> List[str]:
+    formats = ['WEBP']
+    if settings.THUMBNAIL_AVIF_ENABLED:
+        Image.init()
+        if 'AVIF' in Image.SAVE:
+            formats.insert(0, 'AVIF')
+    return formats
+
+
+def get_thumbnail_options(image_format: Optional[str] = None) -> Dict:
+    options = dict(THUMBNAIL_OPTIONS)
+    if image_format:
+        options.update(
+            format=image_format,
+            quality=getattr(settings, f'THUMBNAIL_{image_format}_QUALITY'))
+    return options
+
+
+def negotiate_image_format(request) -> Optional[str]:
+    """
+    The variant format named by the `image_format` query parameter, or
+    the next smaller one rendered here (AVIF may be disabled), None for
+    the original format. Being part of the URL, it keys caches and ETags
+    without varying on request headers.
+    """
+    if request is None:
+        return None
+    requested = request.GET.get(IMAGE_FORMAT_PARAM, '').upper()
+    if requested not in VARIANT_FORMATS:
+        return None
+    variant_formats = get_variant_formats()
+    for image_format in VARIANT_FORMATS[VARIANT_FORMATS.index(requested):]:
+        if image_format in variant_formats:
+            return image_format
+    return None
+
+
+def _get_kvstore_values(keys) -> Dict[str, str]:
+    kvstore = default.kvstore
+    kv_cache = getattr(kvstore, 'cache', None)
+    if kv_cache is None:
+        # Not the cached_db store, values are read one by one
+        return {key: kvstore._get_raw(key) for key in keys}
+
+    from sorl.thumbnail.models import KVStore as KVStoreModel
+
+    values = {
+        key: value for key, value in kv_cache.get_many(keys).items()
+        if isinstance(value, str)
+    }
+    missing = [key for key in keys if key not in values]
+    if missing:
+        stored = dict(KVStoreModel.objects.filter(
+            key__in=missing).values_list('key', 'value'))
+        if stored:
+            kv_cache.set_many(
+                stored, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT)
+        values.update(stored)
+    return values
+
+
+def resolve_thumbnails(
+        instances: Iterable[ThumbnailMixin],
+        image_format: Optional[str] = None):
+    """
+    Resolves the thumbnail URLs of all `instances` in bulk and stores them
+    on each instance, where `get_thumbnail_url` picks them up.
+    `image_format` selects a variant, e.g. WEBP, instead of the original.
+    """
+    backend = default.backend
+    options = get_thumbnail_options(image_format)
+    pending = []
+    for instance in instances:
+        instance._resolved_thumbnails = {}
+        for name, (file_, geometry) in \
+                instance.get_thumbnail_sources().items():
+            if not file_:
+                instance._resolved_thumbnails[name] = None
+                continue
+            thumbnail = backend.get_thumbnail_file(
+                file_, geometry, **options)
+            pending.append((
+                instance, name, file_, geometry,
+                add_prefix(thumbnail.key, 'image')))
+    if not pending:
+        return
+
+    values = _get_kvstore_values([key for *_, key in pending])
+    for instance, name, file_, geometry, key in pending:
+        if values.get(key):
+            url = deserialize_image_file(values[key]).url
+        else:
+            url = get_thumbnail(file_, geometry, **options).url
+        instance._resolved_thumbnails[name] = url
+
+
+def collect_related(instances, paths: Iterable[str]):
+    """
+    Yields `instances` and the objects reachable through the given
+    `__` separated relation paths. Only prefetched relations are followed,
+    so the yielded objects are the ones serializers will render.
+    """
+    instances = list(instances)
+    yield from instances
+    for path in paths:
+        objects = instances
+        for relation in path.split('__'):
+            objects = [
+                related
+                for obj in objects
+                if relation in getattr(obj, '_prefetched_objects_cache', {})
+                for related in getattr(obj, relation).all()
+            ]
+        yield from objects
+
+
+def get_thumbnail_geometries() -> List[str]:
+    return [
+        settings.THUMBNAIL_TINY_IMAGE_SIZE,
+        settings.THUMBNAIL_SMALL_IMAGE_SIZE,
+        settings.THUMBNAIL_LARGE_IMAGE_SIZE,
+        settings.THUMBNAIL_AVATAR_IMAGE_SIZE,
+    ]
+
+
+def has_thumbnail_sources(instance: ThumbnailMixin) -> bool:
+    return any(
+        getattr(instance, field_name)
+        for field_name in instance.thumbnail_source_fields)
+
+
+def generate_thumbnails(instance: ThumbnailMixin) -> int:
+    """
+    Pre-renders every configured geometry of every source image of
+    `instance`, in the original format and every variant format,
+    decoding each source once.
+    """
+    backend = default.backend
+    geometries = get_thumbnail_geometries()
+    variants = [{}] + [
+        {key: options[key] for key in ('format', 'quality')}
+        for options in map(get_thumbnail_options, get_variant_formats())
+    ]
+    generated = 0
+    for field_name in instance.thumbnail_source_fields:
+        file_ = getattr(instance, field_name)
+        if file_:
+            generated += len(backend.create_thumbnails(
+                file_, geometries, variants=variants, **THUMBNAIL_OPTIONS))
+    return generated
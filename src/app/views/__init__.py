@@ -4,4 +4,8 @@ from .stripe import (
     ByndeStripeAccountUpdateAPIView, StripeRefreshView, StripeReturnView)
 from .order import BuyerOrdersViewSet, SellerOrderItemViewSet, BuyerOrderItemViewSet
 from .feedback import *
-from .product import ProductViewSet, AddFavoriteAPIView, RemoveFavoriteAPIView
+from .product import (
+    ProductViewSet, AddFavoriteAPIView, RemoveFavoriteAPIView,
+    ProductImageUploadView, ProductImagePresignView, ProductImageConfirmView,
+    BackgroundRemovalJobView, BackgroundRemovalJobDetailView,
+    ProductImportView, ProductImageProgressStreamView)
@@ -1,22 +1,29 @@
+from django.conf import settings
 from django.db import transaction
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from rest_framework import filters, mixins, status, viewsets, views, generics
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.parsers import JSONParser, MultiPartParser
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 
 from app.filtersets import ProductFilterSet
+from app.parsers import CSVParser, JSONLinesParser
 from app.ordering import ProductOrderingFilter
-from app.paginations import StandardResultsSetPagination
+from app.search import ProductSearchFilter
+from app.facets import count_facets, get_materialized_facets, group_facets
+from app.paginations import (
+    StandardResultsSetPagination, ProductFeedPagination)
 
 from rest_framework.views import APIView
 
 from app.models import (
     Bundle, Product,
     BundleReport, BundleRating,
-    ProductCategory, ProductBrand,
-    ProductSize, ProductImage
+    ProductImage, BackgroundRemovalJob
 )
 from app.models.product import BG_REMOVAL_STATUS
 from app.permissions import IsBundleOwner, IsProductImageOwner
@@ -30,13 +37,21 @@ from app.serializers.listing import (
     BundleTrackerSerializer, BundleReportCreateSerializer,
     BundleReportSerializer, BundleRatingSerializer,
     SellingItemCreateSerializer, SellingItemSerializer,
-    SellingItemDetailSerializer, ProductCategorySerializer,
-    ProductBrandSerializer, ProductSizeSerializer,
+    SellingItemDetailSerializer,
     ProductBrandCreateSerializer, ProductImageSerializer,
-    SellingImageBackgroundRemovalStatus
+    SellingImageBackgroundRemovalStatus, ProductImageUploadSerializer,
+    ProductImagePresignSerializer, ProductImageConfirmSerializer,
+    BackgroundRemovalJobSerializer, ProductImportSerializer
 )
+from app.services import create_image_upload
+from app.utils import with_serializer_query_plan
 from app.utils.address import validate_usps_address
-from cacheops import cache, CacheMiss
+from app.utils.cache import (
+    FEED_OPTIONS_TAG, OPTIONS_TAG, get_cached_feed, get_feed_cache_key,
+    get_feed_cache_stats, get_feed_tags, get_product_tag, set_cached_feed)
+from app.decorators import conditional_etag
+from app.utils.options import get_option_trees
+from app.utils.progress import stream_bg_removal_progress
 from django.contrib.auth import authenticate, login
 
 class AddFavoriteAPIView(APIView):
@@ -123,11 +138,11 @@ class ProductViewSet(
     # print('querySet...', queryset)
     serializer_class = ProductSerializer
     filter_backends = (
-        DjangoFilterBackend, ProductOrderingFilter, filters.SearchFilter)
+        DjangoFilterBackend, ProductSearchFilter, ProductOrderingFilter)
     # print('filterBackends', filter_backends)
     filterset_class = ProductFilterSet
     search_fields = ['title']
-    pagination_class = StandardResultsSetPagination
+    pagination_class = ProductFeedPagination
 
     http_method_names = ('get', 'patch', 'post')
 
@@ -170,12 +185,14 @@ class ProductViewSet(
         return self.update_(request, *args, **kwargs)
 
     def get_queryset(self):
-        if self.action == 'retrieve':
-            return Bundle.objects.get_all_exclude_draft()
-        elif self.action == 'list':
-            return Product.objects.get_all_published()
+        if self.action in ['list', 'retrieve']:
+            return with_serializer_query_plan(
+                Product.objects.get_all_published(),
+                self.get_serializer_class())
         elif self.action == 'purchased_by':
-            return self.request.user.purchased_listings.all()
+            return with_serializer_query_plan(
+                Product.objects.get_all_purchased(self.request.user),
+                self.get_serializer_class())
 
         qs = Bundle.objects.get_all_published(self.request.user)
         if not self.request.user.is_anonymous and \
@@ -183,14 +200,51 @@ class ProductViewSet(
             qs = qs.filter(hidden=False)
         return qs
 
+    def is_feed_cacheable(self, request) -> bool:
+        return self.action == 'list' and request.user.is_anonymous and \
+            request.accepted_renderer.format == 'json'
+
+    @conditional_etag(
+        lambda view, request, *args, **kwargs: get_feed_tags(
+            request.query_params))
     def list(self, request, *args, **kwargs):
+        cache_key = None
+        if self.is_feed_cacheable(request):
+            cache_key = get_feed_cache_key(request)
+            content = get_cached_feed(cache_key)
+            if content is not None:
+                return HttpResponse(
+                    content, content_type=request.accepted_media_type)
+
         queryset = self.filter_queryset(self.get_queryset())
         page = self.paginate_queryset(queryset)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+            response = self.get_paginated_response(serializer.data)
+        else:
+            serializer = self.get_serializer(queryset, many=True)
+            response = Response(serializer.data)
+
+        if cache_key:
+            response.add_post_render_callback(
+                lambda rendered: set_cached_feed(cache_key, rendered.content))
+        return response
+
+    # The detail renders brand, category and size names too
+    @conditional_etag(
+        lambda view, request, *args, **kwargs: [get_product_tag(
+            kwargs[view.lookup_url_kwarg or view.lookup_field]),
+            FEED_OPTIONS_TAG])
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    @action(
+        detail=False, methods=['get'],
+        url_name='cache_stats', url_path='cache_stats',
+        permission_classes=[IsAdminUser]
+    )
+    def cache_stats(self, request, *args, **kwargs):
+        return Response(get_feed_cache_stats())
 
     @action(
         detail=True, methods=['patch'],
@@ -226,6 +280,26 @@ class ProductViewSet(
     def receive(self, request, *args, **kwargs):
         return self.partial_update_(request, *args, **kwargs)
 
+    @action(
+        detail=False, methods=['get'],
+        url_name='facets', url_path='facets'
+    )
+    def facets(self, request, *args, **kwargs):
+        """
+        Product counts per filter value, e.g. `{"brand": {"3": 42}}`.
+        Without filters the materialized counts are returned, otherwise all
+        facets are counted under the current filters in a single query.
+        """
+        filter_params = set(ProductFilterSet.base_filters) | {
+            ProductSearchFilter.search_param}
+        if not filter_params & set(request.query_params):
+            return Response(get_materialized_facets())
+
+        queryset = Product.objects.get_all_published()
+        for backend in (DjangoFilterBackend, ProductSearchFilter):
+            queryset = backend().filter_queryset(request, queryset, self)
+        return Response(group_facets(count_facets(queryset)))
+
     @action(
         detail=False, methods=['get'],
         url_name='purchased_by', url_path='purchased_by',
@@ -279,6 +353,7 @@ class SellingImageViewSet(viewsets.ModelViewSet):
         serializer.is_valid(raise_exception=True)
         instance = serializer.save()
         instance.request_to_remove_background()
+        instance.save(update_fields=['bg_removal_status', 'bg_removal_task_uuid'])
         return Response({"id": instance.id}, status=status.HTTP_202_ACCEPTED)
 
     @action(
@@ -304,7 +379,11 @@ class SellingViewSet(viewsets.ModelViewSet):
     ordering = ('-created')
 
     def get_queryset(self):
-        return self.queryset.filter(created_by=self.request.user)
+        queryset = self.queryset.filter(created_by=self.request.user)
+        if self.action == 'list':
+            queryset = with_serializer_query_plan(
+                queryset, self.get_serializer_class())
+        return queryset
 
     def get_serializer_class(self):
         if self.action == 'create':
@@ -502,29 +581,127 @@ class ProductBrandSuggestAPIView(generics.CreateAPIView):
     permission_classes = [IsAuthenticated]
 
 
-class ProductOptionView(views.APIView):
-    def get(self, request, format=None, **kwargs):
+class ProductImageUploadView(generics.CreateAPIView):
+    """
+    Multipart upload of a product image.
+    The file is spooled to a temporary file in chunks instead of being
+    buffered in memory, only its header is validated and storage uploads
+    straight from the file handle. Base64 images sent through the selling
+    serializers are still accepted.
+    """
+    serializer_class = ProductImageUploadSerializer
+    parser_classes = (MultiPartParser,)
+    permission_classes = (IsAuthenticated,)
+
+    def initialize_request(self, request, *args, **kwargs):
+        # Must be set before anything reads request.POST/FILES
+        request.upload_handlers = [TemporaryFileUploadHandler(request)]
+        return super().initialize_request(request, *args, **kwargs)
+
+    def perform_create(self, serializer):
+        serializer.save(created_by=self.request.user)
+
+
+class ProductImagePresignView(views.APIView):
+    """
+    Presigned POST for uploading a product image straight to S3, the
+    bytes never pass through the API. Confirm the upload afterwards with
+    the returned token, see ProductImageConfirmView.
+    """
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request, *args, **kwargs):
+        serializer = ProductImagePresignSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        upload = create_image_upload(user=request.user, **serializer.validated_data)
+        return Response(upload, status=status.HTTP_201_CREATED)
+
+
+class ProductImageConfirmView(generics.CreateAPIView):
+    """ Creates the ProductImage of a finished presigned upload """
+    serializer_class = ProductImageConfirmSerializer
+    permission_classes = (IsAuthenticated,)
+
+
+class ProductImageProgressStreamView(views.APIView):
+    """
+    Server-sent events with the background removal progress of the `ids`
+    (comma separated) images of the user, pushed by the workers.
+    """
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request, *args, **kwargs):
         try:
-            resp = cache.get('item_options')
-        except CacheMiss:
-            listing_item_size = ProductSize.objects.filter(
-                parent__isnull=True)
-            listing_item_size_serializer = ProductSizeSerializer(
-                listing_item_size, many=True)
-
-            listing_item_category = ProductCategory.objects.filter(
-                parent__isnull=True)
-            listing_item_category_serializer = ProductCategorySerializer(
-                listing_item_category, many=True)
-
-            listing_item_brand = ProductBrand.objects.filter(
-                parent__isnull=True)
-            listing_item_brand_serializer = ProductBrandSerializer(
-                listing_item_brand, many=True)
-            resp = {
-                'sizes': listing_item_size_serializer.data,
-                'categories': listing_item_category_serializer.data,
-                'brands': listing_item_brand_serializer.data,
+            ids = {
+                int(pk)
+                for pk in request.query_params.get('ids', '').split(',') if pk
             }
-            cache.set('item_options', resp, timeout=None)
-        return Response(resp)
+        except ValueError:
+            return Response(
+                {'ids': 'Comma separated image ids expected'},
+                status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > settings.BG_REMOVAL_PROGRESS_MAX_IMAGES:
+            return Response(
+                {'ids': f'At most {settings.BG_REMOVAL_PROGRESS_MAX_IMAGES} '
+                        f'images per stream'},
+                status=status.HTTP_400_BAD_REQUEST)
+        # Evaluated by the stream, once subscribed
+        images = ProductImage.objects.filter(
+            pk__in=ids, created_by=request.user).only('pk', 'bg_removal_status')
+        response = StreamingHttpResponse(
+            stream_bg_removal_progress(
+                ids, images,
+                [BG_REMOVAL_STATUS.done, BG_REMOVAL_STATUS.failed]),
+            content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Don't let a proxy buffer the events
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class BackgroundRemovalJobView(generics.CreateAPIView):
+    """
+    Queues the background removal of several images as one job, run as
+    a single batched inference. Poll the job for the status of each.
+    """
+    serializer_class = BackgroundRemovalJobSerializer
+    permission_classes = (IsAuthenticated,)
+
+
+class BackgroundRemovalJobDetailView(generics.RetrieveAPIView):
+    serializer_class = BackgroundRemovalJobSerializer
+    permission_classes = (IsAuthenticated,)
+
+    def get_queryset(self):
+        return BackgroundRemovalJob.objects.filter(
+            created_by=self.request.user)
+
+
+class ProductImportView(views.APIView):
+    """
+    Bulk creates or updates the items of the user from JSON, JSON lines or
+    CSV rows, see ProductImportRowSerializer for the columns. A JSON list
+    or any other body takes the target bundle from `?bundle=`.
+    """
+    parser_classes = (JSONParser, JSONLinesParser, CSVParser)
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request, *args, **kwargs):
+        data = request.data
+        if isinstance(data, list):
+            data = {
+                'rows': data,
+                'bundle': request.query_params.get('bundle'),
+            }
+        serializer = ProductImportSerializer(
+            data=data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class ProductOptionView(views.APIView):
+    @conditional_etag(lambda view, request, *args, **kwargs: [OPTIONS_TAG])
+    def get(self, request, format=None, **kwargs):
+        return HttpResponse(
+            get_option_trees(), content_type='application/json')
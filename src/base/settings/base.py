@@ -87,6 +87,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "corsheaders",
     "auditlog",
 
@@ -363,6 +364,12 @@ THUMBNAIL_SMALL_IMAGE_SIZE = "600x800"
 # LARGE NOT USED..
 THUMBNAIL_LARGE_IMAGE_SIZE = "600x800"
 THUMBNAIL_AVATAR_IMAGE_SIZE = "128x128"
+# Modern format variants rendered next to the original thumbnails and
+# served to clients whose Accept header lists them
+THUMBNAIL_WEBP_QUALITY = 80
+# AVIF also needs a Pillow build (or plugin) that can encode it
+THUMBNAIL_AVIF_ENABLED = strtobool(os.getenv("THUMBNAIL_AVIF_ENABLED", "False"))
+THUMBNAIL_AVIF_QUALITY = 60
 
 
 TWILIO_API_KEY = os.getenv("TWILIO_API_KEY")
@@ -492,6 +499,24 @@ CORS_ALLOW_CREDENTIALS = True
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10485760  # 10 MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 11534336  # 11 MB
 
+# Direct-to-S3 product image uploads (presigned POST)
+PRODUCT_IMAGE_UPLOAD_MAX_SIZE = 20971520  # 20 MB
+PRODUCT_IMAGE_UPLOAD_EXPIRES = 60 * 15
+
+# Bulk product imports, see app.services.listing.bulk_import_products
+PRODUCT_IMPORT_MAX_ROWS = 1000
+PRODUCT_IMPORT_MAX_IMAGES = 20
+# Image URLs are fetched concurrently by finish_product_import
+PRODUCT_IMPORT_DOWNLOAD_WORKERS = 8
+PRODUCT_IMPORT_DOWNLOAD_TIMEOUT = 30
+# Hosts (and their subdomains) image URLs may be imported from, any public
+# host when empty. Private, loopback and link-local addresses never are.
+PRODUCT_IMPORT_IMAGE_HOSTS = [
+    host.strip() for host in
+    os.getenv("PRODUCT_IMPORT_IMAGE_HOSTS", "").split(",") if host.strip()
+]
+PRODUCT_IMPORT_MAX_REDIRECTS = 3
+
 # STRIPE
 STRIPE_PUBLISHABLE_KEY = "pk_test_51Mw5SEL57dGnBnScUFqGMHdOgUaFVUUCDTDMTcjFZ9fSGhJVx80ao3xOD5zJ5Az6yCfzZeOFfFjiUS0CyQUJjvha00TQ474QWO"
 STRIPE_CONNECT_CLIENT_ID = os.environ.get("STRIPE_CONNECT_CLIENT_ID")
@@ -556,12 +581,40 @@ DATA_STORAGE_PATH = os.path.join(PROJECT_ROOT, "storage")
 DATA_BG_REMOVAL_SOURCE_PATH = os.path.join(
     DATA_STORAGE_PATH, "tmp", "bg_removal_source"
 )
+# Background removal inference, see app/utils/bg_removal/engine.py
+BG_REMOVAL_MODEL = os.environ.get("BG_REMOVAL_MODEL", "u2net")
+# torch, torchscript or onnx, int8 weights need the onnx backend
+BG_REMOVAL_BACKEND = os.environ.get("BG_REMOVAL_BACKEND", "torch")
+BG_REMOVAL_QUANTIZED = strtobool(os.getenv("BG_REMOVAL_QUANTIZED", "False"))
+BG_REMOVAL_WORKERS = int(os.environ.get("BG_REMOVAL_WORKERS", 2))
+BG_REMOVAL_THREADS = int(os.environ.get("BG_REMOVAL_THREADS", 2))
+BG_REMOVAL_BATCH_SIZE = int(os.environ.get("BG_REMOVAL_BATCH_SIZE", 4))
+# Keep the U2NET probabilities as alpha instead of a 0.5 threshold
+BG_REMOVAL_SOFT_ALPHA = strtobool(os.getenv("BG_REMOVAL_SOFT_ALPHA", "True"))
+BG_REMOVAL_OUTPUT_FORMAT = os.environ.get("BG_REMOVAL_OUTPUT_FORMAT", "PNG")
+BG_REMOVAL_WEBP_QUALITY = 90
+# Server-sent progress streams hold a uwsgi thread, clients reconnect
+# after this many seconds
+BG_REMOVAL_PROGRESS_STREAM_TIMEOUT = int(
+    os.environ.get("BG_REMOVAL_PROGRESS_STREAM_TIMEOUT", 10))
+# Images a single background removal job may hold
+BG_REMOVAL_JOB_MAX_IMAGES = 50
+# Images a progress stream may follow, a job's worth
+BG_REMOVAL_PROGRESS_MAX_IMAGES = BG_REMOVAL_JOB_MAX_IMAGES
 LISTING_ITEM_IMAGE_RESIZE_DEFAULT_WIDTH = int(
     os.environ.get("LISTING_ITEM_IMAGE_RESIZE_DEFAULT_WIDTH", 600)
 )
 LISTING_ITEM_IMAGE_RESIZE_DEFAULT_HEIGHT = int(
     os.environ.get("LISTING_ITEM_IMAGE_RESIZE_DEFAULT_HEIGHT", 800)
 )
+# Uploaded originals are downscaled to this longest edge on ingest
+LISTING_ITEM_IMAGE_MAX_EDGE = int(
+    os.environ.get("LISTING_ITEM_IMAGE_MAX_EDGE", 2048)
+)
+LISTING_ITEM_IMAGE_QUALITY = 90
+# Reuse the stored file (and thumbnails) of byte-identical product images
+PRODUCT_IMAGE_CONTENT_ADDRESSED = strtobool(
+    os.getenv("PRODUCT_IMAGE_CONTENT_ADDRESSED", "False"))
 
 REDIS_CACHE_LOCATION = os.environ.get(
     "REDIS_CACHE_LOCATION", "redis://redis:6379/1")
@@ -574,6 +627,8 @@ CACHES = {
     }
 }
 CACHE_DEFAULT_TIMEOUT = 60 * 60  # 1 hour
+# Rendered anonymous product feed pages, see app.utils.cache
+PRODUCT_FEED_CACHE_TIMEOUT = 60 * 10
 
 # https://github.com/Suor/django-cacheops
 CACHEOPS_REDIS = REDIS_CACHE_LOCATION
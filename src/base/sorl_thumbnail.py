@@ -1,14 +1,93 @@
-from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail import default
+from sorl.thumbnail.base import EXTENSIONS, ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings, settings
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.parsers import parse_geometry
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
+FORMAT_EXTENSIONS = dict(EXTENSIONS, AVIF='avif')
+
 
 class Thumbnail(ThumbnailBackend):
     def _get_thumbnail_filename(self, source, geometry_string, options):
         """
         Computes the destination filename for thumbnails.
-        We want to keep each thumbnail along side original image
+        We want to keep each thumbnail along side original image,
+        format variants (e.g. WEBP) only differ by their extension.
         """
         file_name = source.name.split('/')[-1]
         file_name, file_extension = file_name.split('.')
+        format_ = options.get('format')
+        if format_ and format_ != self._get_format(source):
+            file_extension = FORMAT_EXTENSIONS.get(format_, file_extension)
         file = f'{file_name}_{geometry_string}.{file_extension}'
         return os.path.join('listings', file)
+
+    def get_thumbnail_options(self, source, options):
+        """
+        Fills in the default options exactly like `get_thumbnail` does,
+        so names computed from them match the generated thumbnails.
+        """
+        options = dict(options)
+        if settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        return options
+
+    def get_thumbnail_file(self, file_, geometry_string, **options):
+        """
+        The thumbnail `get_thumbnail` would return, without touching the
+        key value store or the storage.
+        """
+        source = ImageFile(file_)
+        options = self.get_thumbnail_options(source, options)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+    def create_thumbnails(self, file_, geometries, variants=({},), **options):
+        """
+        Renders `file_` at every geometry from a single decode of the
+        source and records the results in the key value store.
+        Each geometry is resized once and encoded once per variant, a dict
+        of option overrides such as `{'format': 'WEBP', 'quality': 80}`.
+        """
+        source = ImageFile(file_)
+        source_image = default.engine.get_image(source)
+        try:
+            image_info = default.engine.get_image_info(source_image)
+            source.set_size(default.engine.get_image_size(source_image))
+            default.kvstore.get_or_set(source)
+
+            options = self.get_thumbnail_options(source, options)
+            options['image_info'] = image_info
+            ratio = default.engine.get_image_ratio(source_image, options)
+
+            thumbnails = []
+            for geometry_string in dict.fromkeys(geometries):
+                logger.debug(
+                    'Pre-rendering [%s] at [%s]', source.name, geometry_string)
+                image = default.engine.create(
+                    source_image, parse_geometry(geometry_string, ratio),
+                    options)
+                size = default.engine.get_image_size(image)
+                for variant in variants:
+                    variant_options = dict(options, **variant)
+                    thumbnail = ImageFile(
+                        self._get_thumbnail_filename(
+                            source, geometry_string, variant_options),
+                        default.storage)
+                    default.engine.write(image, variant_options, thumbnail)
+                    thumbnail.set_size(size)
+                    default.kvstore.set(thumbnail, source)
+                    thumbnails.append(thumbnail)
+            return thumbnails
+        finally:
+            default.engine.cleanup(source_image)